@@ -2,18 +2,23 @@
 import logging
 import os
 import pandas as pd
+from src.config import MEMORY_BUDGET, SPILL_DIR, QUALITY_MAX_ERROR_RATE, CHANGE_LOG
+from src.changelog import ChangeLog, StateRollup
 from src.database import DatabaseConnection
 from src.transform import DataTransformer
+from src.vintages import PopulationVintages
 from src.load import DataLoader
+from src.profiling import DataProfiler, save_quality_report
+from src.spill import SpilledRecords
 from src.visualization import Visualizer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
+def main(base_dir=None):
     # Set base directory and paths
-    base_dir = os.path.abspath(os.path.dirname(__file__))
+    base_dir = base_dir or os.path.abspath(os.path.dirname(__file__))
     census_db_path = os.path.join(base_dir, 'data', 'census.sqlite')
     census_csv_path = os.path.join(base_dir, 'data', 'census.csv')
     results_dir = os.path.join(base_dir, 'results')
@@ -24,10 +29,19 @@ def main():
     # Set up pipeline components
     db_conn = DatabaseConnection(census_db_path)
     census, state_fact = db_conn.reflect_tables()
-    transformer = DataTransformer(db_conn.connection, census, state_fact)
-    loader = DataLoader(db_conn.connection, db_conn.engine, results_dir)
+    compact = db_conn.reflect_compact_tables()
+    changelog = rollup = None
+    if CHANGE_LOG:
+        changelog = ChangeLog(db_conn.connection, db_conn.engine, db_conn.metadata)
+        rollup = StateRollup(db_conn.connection, db_conn.engine, census, changelog)
+    transformer = DataTransformer(db_conn.connection, census, state_fact, compact,
+                                  memory_budget=MEMORY_BUDGET, spill_dir=SPILL_DIR, rollup=rollup)
+    loader = DataLoader(db_conn.connection, db_conn.engine, results_dir, compact,
+                        memory_budget=MEMORY_BUDGET, changelog=changelog)
     visualizer = Visualizer(results_dir)
+    profiler = DataProfiler(db_conn.connection, state_fact, max_error_rate=QUALITY_MAX_ERROR_RATE)
 
+    values_list = None
     try:
         # Step 1: Extract data from the CSV
         logger.info("Starting data extraction from CSV")
@@ -39,23 +53,33 @@ def main():
         census_df.columns = ['state', 'sex', 'age', 'pop2000', 'pop2008']
         logger.info(f"Successfully extracted {len(census_df)} records from CSV")
 
-        # Step 2: Transform the extracted data
+        # Step 2: Profile data quality and reject bad files before any insert
+        quality_report = profiler.profile(census_df)
+        save_quality_report(quality_report, os.path.join(results_dir, 'quality_report.json'))
+        profiler.enforce(quality_report)
+
+        # Step 3: Transform the extracted data
         logger.info("Starting data transformation")
         transformed_data, values_list = transformer.transform(census_df)
 
-        # Step 3: Load the transformed data into the database and generate a report
+        # Step 4: Load the transformed data into the database and write the reports
         logger.info("Starting data loading and report generation")
-        report_content = loader.load(transformed_data, values_list, census, state_fact)
+        loader.load(transformed_data, values_list, census, state_fact)
+
+        # Keep the long-format vintages in step with the wide census table
+        vintages = PopulationVintages(db_conn.connection, db_conn.engine, db_conn.metadata)
+        if vintages.exists():
+            vintages.migrate_from_wide(census)
+
+        # Persist the inserts together with the change log and rollup rows;
+        # closing the connection would otherwise roll all of them back
+        db_conn.connection.commit()
 
-        # Step 4: Visualize the population change data and save the plot
+        # Step 5: Visualize the population change data and save the plot
         logger.info("Generating population change plot")
         visualizer.plot_population_change(transformed_data['pop_change'])
 
-        # Optional: Save the final report as a Markdown file
         report_path = os.path.join(results_dir, 'census_report.md')
-        with open(report_path, 'w') as f:
-            f.write(report_content)
-
         logger.info(f"ETL pipeline completed successfully. Report saved to {report_path}")
 
     except Exception as e:
@@ -63,6 +87,10 @@ def main():
         raise
 
     finally:
+        # Remove any chunks the transform spilled to disk
+        if isinstance(values_list, SpilledRecords):
+            values_list.close()
+
         # Close the database connection
         db_conn.close_connection()
 
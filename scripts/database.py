@@ -1,8 +1,15 @@
+import asyncio
+import csv
+import functools
+import io
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine, MetaData, Table, select, func
 from sqlalchemy import inspect
 import logging
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 
 # Set up logging
@@ -12,6 +19,18 @@ logging.basicConfig(level=logging.INFO)
 # Global database connection variable
 db_conn = None
 
+# Dedicated pool for blocking SQLAlchemy work so it never runs on the event loop
+db_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DB_WORKERS", "4")), thread_name_prefix="db")
+
+async def run_db(func, *args):
+    """Run a blocking database call in the dedicated executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args))
+
+# Rows fetched per round trip when streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
 # Database connection class
 class DatabaseConnection:
     def __init__(self, db_path):
@@ -32,8 +51,11 @@ class DatabaseConnection:
             sqlite_url = f'sqlite:///{self.db_path}'
             logger.info(f"Using SQLite URL: {sqlite_url}")
             
-            # Create engine with echo=True for debugging
-            self.engine = create_engine(sqlite_url, echo=True)
+            # Create engine with echo=True for debugging. Streaming exports are
+            # advanced on whichever threadpool worker is free, so a connection
+            # must not be pinned to the thread that opened it.
+            self.engine = create_engine(sqlite_url, echo=True,
+                                        connect_args={"check_same_thread": False})
             self.connection = self.engine.connect()
             logger.info("Database connection established successfully")
             
@@ -49,7 +71,8 @@ class DatabaseConnection:
     def reflect_tables(self):
         try:
             inspector = inspect(self.engine)
-            table_names = inspector.get_table_names()
+            # After the compact layout migration census is a view
+            table_names = inspector.get_table_names() + inspector.get_view_names()
             logger.info(f"Found tables: {table_names}")
             
             if not table_names:
@@ -123,12 +146,20 @@ async def connect_db():
         if not db_conn:
             logger.error("Database connection not initialized")
             raise RuntimeError("Database connection not initialized")
-        census, state_fact = db_conn.reflect_tables()
+        census, state_fact = await run_db(db_conn.reflect_tables)
         return {"status": "success", "message": "Database connected and tables reflected"}
     except Exception as e:
         logger.error(f"Connect endpoint failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def check_database(db_path):
+    """Open the database and reflect the required tables."""
+    db_conn = DatabaseConnection(db_path)
+    try:
+        db_conn.reflect_tables()
+    finally:
+        db_conn.close_connection()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -137,15 +168,82 @@ async def health_check():
         if not os.path.exists(db_path):
             raise HTTPException(status_code=503, detail="Database file not found")
         
-        db_conn = DatabaseConnection(db_path)
-        census, state_fact = db_conn.reflect_tables()
-        db_conn.close_connection()
+        # Runs on the default executor so a busy db_executor cannot delay probes
+        await asyncio.to_thread(check_database, db_path)
         
         return {"status": "healthy"}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail=str(e))
 
+def export_statement(census, dataset):
+    """Build the query behind an export dataset."""
+    if dataset == "rows":
+        return select(census.c.state, census.c.sex, census.c.age, census.c.pop2000, census.c.pop2008)
+    if dataset == "age":
+        return select(
+            census.c.age, census.c.sex,
+            func.sum(census.c.pop2000).label("pop2000"),
+            func.sum(census.c.pop2008).label("pop2008")
+        ).group_by(census.c.age, census.c.sex).order_by(census.c.age, census.c.sex)
+    if dataset == "state":
+        return select(
+            census.c.state, census.c.sex,
+            func.sum(census.c.pop2000).label("pop2000"),
+            func.sum(census.c.pop2008).label("pop2008")
+        ).group_by(census.c.state, census.c.sex).order_by(census.c.state, census.c.sex)
+    raise ValueError(f"Unknown export dataset: {dataset}")
+
+def stream_export(db_path, dataset, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """Yield an export in fixed-size batches from a server-side cursor."""
+    db_conn = DatabaseConnection(db_path)
+    try:
+        census, _ = db_conn.reflect_tables()
+        stmt = export_statement(census, dataset)
+        result = db_conn.connection.execution_options(
+            stream_results=True, max_row_buffer=batch_size).execute(stmt)
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(columns)
+        exported = 0
+        for partition in result.partitions(batch_size):
+            if fmt == "csv":
+                writer.writerows(partition)
+            else:
+                for row in partition:
+                    buffer.write(json.dumps(dict(zip(columns, row))))
+                    buffer.write("\n")
+            exported += len(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if fmt == "csv" and not exported:
+            yield buffer.getvalue()
+        logger.info(f"Exported {exported} {dataset} rows as {fmt}")
+    finally:
+        db_conn.close_connection()
+
+@app.get("/export")
+async def export_data(dataset: str = "rows", format: str = "csv"):
+    """Stream census rows or per-age/per-state breakdowns as CSV or NDJSON."""
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    if dataset not in ("rows", "age", "state"):
+        raise HTTPException(status_code=400, detail=f"Unknown export dataset: {dataset}")
+
+    db_path = os.getenv("DB_PATH", "/data/census.sqlite")
+    if not os.path.exists(db_path):
+        raise HTTPException(status_code=500, detail=f"Database file not found: {db_path}")
+
+    # Starlette iterates sync generators in its threadpool, so the cursor never blocks the loop
+    return StreamingResponse(
+        stream_export(db_path, dataset, format, EXPORT_BATCH_SIZE),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=census_{dataset}.{format}"}
+    )
+
 # Run with uvicorn when executed directly
 if __name__ == "__main__":
     import uvicorn
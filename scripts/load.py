@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import pandas as pd
 import logging
 from sqlalchemy import create_engine, MetaData, Table, select, func, case, cast, Float, desc, insert, update
@@ -5,13 +7,27 @@ from sqlalchemy import inspect
 from fastapi import FastAPI, HTTPException
 import json
 import os
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
+from src.compact import CompactCensus
+from src.config import MEMORY_BUDGET
+from src.report import CensusReport, ReportWriter
+from src.spill import describe_peak_memory, estimate_records_bytes, iter_records_ndjson, track_peak_memory
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
 
+# Dedicated pool for blocking SQLAlchemy work so it never runs on the event loop
+db_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DB_WORKERS", "4")), thread_name_prefix="db")
+
+async def run_db(func, *args):
+    """Run a blocking database call in the dedicated executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args))
+
 class DatabaseConnection:
     def __init__(self, db_path):
         self.db_path = db_path
@@ -35,7 +51,9 @@ class DatabaseConnection:
     def reflect_tables(self):
         try:
             inspector = inspect(self.engine)
-            if 'census' not in inspector.get_table_names() or 'state_fact' not in inspector.get_table_names():
+            # After the compact layout migration census is a view
+            table_names = inspector.get_table_names() + inspector.get_view_names()
+            if 'census' not in table_names or 'state_fact' not in table_names:
                 logger.error("Required tables 'census' or 'state_fact' not found")
                 raise ValueError("Required tables 'census' or 'state_fact' not found")
             census = Table('census', self.metadata, autoload_with=self.engine)
@@ -46,25 +64,67 @@ class DatabaseConnection:
             logger.error(f"Error reflecting tables: {e}")
             raise
 
+    def reflect_compact_tables(self):
+        """Return the compact census layout if the database has been migrated"""
+        compact = CompactCensus(self.engine, self.metadata)
+        return compact if compact.exists() else None
+
     def close_connection(self):
         if self.connection:
             self.connection.close()
             logger.info("Database connection closed")
 
 class DataLoader:
-    def __init__(self, connection, census, state_fact, results_dir):
+    def __init__(self, connection, census, state_fact, results_dir, compact=None):
         self.connection = connection
         self.census = census
         self.state_fact = state_fact
         self.results_dir = results_dir
+        self.compact = compact
+
+    def _insert_batch(self, batch):
+        if self.compact is not None:
+            # Encode once per batch instead of firing the view's per-row trigger
+            return self.connection.execute(insert(self.compact.census),
+                                           self.compact.encode(self.connection, batch)).rowcount
+        return self.connection.execute(insert(self.census), batch).rowcount
+
+    def _report_statements(self):
+        if self.compact is not None:
+            return self.compact.report_statements()
+
+        pop_by_state = select(
+            self.census.c.state,
+            func.sum(self.census.c.pop2008).label('total_population')
+        ).group_by(self.census.c.state)
+
+        age_dist = select(
+            self.census.c.age,
+            func.sum(self.census.c.pop2008).label('population')
+        ).group_by(self.census.c.age)
+
+        gender_ratio = select(
+            self.census.c.state,
+            (func.sum(case((self.census.c.sex == 'F', self.census.c.pop2008), else_=0)) /
+             func.sum(case((self.census.c.sex == 'M', self.census.c.pop2008), else_=0))).label('gender_ratio')
+        ).group_by(self.census.c.state)
 
-    def load_data(self, values_list, transformed_data):
+        return pop_by_state, age_dist, gender_ratio
+
+    def load_data(self, batches, transformed_data):
+        """Insert the record batches, then update state_fact and write the reports"""
         logger.info("Starting data loading")
         try:
-            if values_list:
-                insert_stmt = insert(self.census)
-                result = self.connection.execute(insert_stmt, values_list)
-                logger.info(f"Inserted {result.rowcount} records into census table")
+            inserted = 0
+            stats = {}
+            tracker = track_peak_memory(stats) if MEMORY_BUDGET is not None else nullcontext()
+            with tracker:
+                for batch in batches:
+                    if batch:
+                        inserted += self._insert_batch(batch)
+            logger.info(f"Inserted {inserted} records into census table")
+            if MEMORY_BUDGET is not None:
+                logger.info(f"Load {describe_peak_memory(stats)}")
 
             update_stmt = update(self.state_fact).values(notes='The Wild West') \
                 .where(self.state_fact.c.census_region_name == 'West')
@@ -73,53 +133,26 @@ class DataLoader:
 
             # Generate JSON report
             report = {}
+            pop_by_state, age_dist, gender_ratio = self._report_statements()
             
             # Total population by state
-            pop_by_state = select(
-                self.census.c.state,
-                func.sum(self.census.c.pop2008).label('total_population')
-            ).group_by(self.census.c.state)
             report['population_by_state'] = [
                 (row[0], int(row[1])) for row in self.connection.execute(pop_by_state).fetchall()
             ]
             
             # Age distribution
-            age_dist = select(
-                self.census.c.age,
-                func.sum(self.census.c.pop2008).label('population')
-            ).group_by(self.census.c.age)
             report['age_distribution'] = [
                 (int(row[0]), int(row[1])) for row in self.connection.execute(age_dist).fetchall()
             ]
             
             # Gender ratio by state
-            gender_ratio = select(
-                self.census.c.state,
-                (func.sum(case((self.census.c.sex == 'F', self.census.c.pop2008), else_=0)) /
-                 func.sum(case((self.census.c.sex == 'M', self.census.c.pop2008), else_=0))).label('gender_ratio')
-            ).group_by(self.census.c.state)
             report['gender_ratio'] = [
                 (row[0], float(row[1])) for row in self.connection.execute(gender_ratio).fetchall()
             ]
 
-            # Save JSON report
-            report_path = os.path.join(self.results_dir, "census_report.json")
-            with open(report_path, "w") as f:
-                json.dump(report, f)
-
-            # Generate markdown report with plots
-            report_content = "# Census Analysis Report\n\n"
-            report_content += "## Average Age by Gender\n"
-            for sex, avg_age in transformed_data['avg_age']:
-                report_content += f"- {sex}: {avg_age:.2f}\n"
-
-            report_content += "\n## Percentage Female by State\n"
-            for state, percent in transformed_data['percent_female']:
-                report_content += f"- {state}: {percent:.2f}%\n"
-
-            report_content += "\n## Top 10 States by Population Change\n"
-            for state, change in transformed_data['pop_change']:
-                report_content += f"- {state}: {change:,}\n"
+            # Render Markdown, JSON and HTML from one report model
+            report_model = CensusReport.from_aggregates({**transformed_data, **report})
+            report_content = ReportWriter(self.results_dir).write(report_model)
 
             # Generate population change plot
             states = []
@@ -145,16 +178,20 @@ class DataLoader:
             plt.savefig(os.path.join(self.results_dir, 'pop_change_plot.png'))
             plt.close()
 
-            # Save markdown report
-            with open(os.path.join(self.results_dir, 'census_report.md'), 'w') as f:
-                f.write(report_content)
-
             logger.info("Data loading and report generation completed successfully")
             return report_content
         except Exception as e:
             logger.error(f"Loading failed: {e}")
             raise
 
+def check_database(db_path):
+    """Open the database and reflect the required tables."""
+    db_conn = DatabaseConnection(db_path)
+    try:
+        db_conn.reflect_tables()
+    finally:
+        db_conn.close_connection()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -163,47 +200,74 @@ async def health_check():
         if not os.path.exists(db_path):
             raise HTTPException(status_code=503, detail="Database file not found")
         
-        db_conn = DatabaseConnection(db_path)
-        census, state_fact = db_conn.reflect_tables()
-        db_conn.close_connection()
+        # Runs on the default executor so a busy db_executor cannot delay probes
+        await asyncio.to_thread(check_database, db_path)
         
         return {"status": "healthy"}
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail=str(e))
 
+def value_batches(data, memory_budget=None):
+    """Yield the transformed records in insert batches that fit the memory budget.
+
+    Records come either inline (``values_list``) or, when the transform service
+    ran under a budget, from the NDJSON file named by ``values_path``.
+    """
+    values_path = data.get("values_path")
+    if values_path:
+        if not os.path.exists(values_path):
+            raise ValueError(f"Transformed values file not found: {values_path}")
+        yield from iter_records_ndjson(values_path, memory_budget)
+        return
+
+    values_list = data.get("values_list", [])
+    if memory_budget is None or not values_list:
+        yield values_list
+        return
+    batch_rows = max(1, memory_budget // max(1, estimate_records_bytes(values_list[:1])))
+    for start in range(0, len(values_list), batch_rows):
+        yield values_list[start:start + batch_rows]
+
+def _load_data(include_report=True):
+    """Run the blocking load step; executed in db_executor."""
+    db_path = os.getenv("DB_PATH", "/data/census.sqlite")
+    transformed_data_path = os.getenv("TRANSFORMED_DATA_PATH", "/data/transformed_data.json")
+    results_dir = os.getenv("RESULTS_DIR", "/results")
+    
+    if not os.path.exists(db_path):
+        logger.error(f"Database file not found: {db_path}")
+        raise HTTPException(status_code=500, detail=f"Database file not found: {db_path}")
+    if not os.path.exists(transformed_data_path):
+        logger.error(f"Transformed data file not found: {transformed_data_path}")
+        raise HTTPException(status_code=500, detail=f"Transformed data file not found: {transformed_data_path}")
+
+    os.makedirs(results_dir, exist_ok=True)
+    if not os.access(results_dir, os.W_OK):
+        logger.error(f"No write permission for {results_dir}")
+        raise HTTPException(status_code=500, detail=f"No write permission for {results_dir}")
+
+    db_conn = DatabaseConnection(db_path)
+    census, state_fact = db_conn.reflect_tables()
+    compact = db_conn.reflect_compact_tables()
+    
+    with open(transformed_data_path, "r") as f:
+        data = json.load(f)
+        transformed_data = data.get("transformed_data", {})
+    
+    loader = DataLoader(db_conn.connection, census, state_fact, results_dir, compact)
+    report_content = loader.load_data(value_batches(data, MEMORY_BUDGET), transformed_data)
+    
+    db_conn.close_connection()
+    response = {"status": "success", "message": "Data loaded and reports generated"}
+    if include_report:
+        response["report"] = report_content
+    return response
+
 @app.post("/load")
-async def load_data():
+async def load_data(include_report: bool = True):
     try:
-        db_path = os.getenv("DB_PATH", "/data/census.sqlite")
-        transformed_data_path = os.getenv("TRANSFORMED_DATA_PATH", "/data/transformed_data.json")
-        results_dir = os.getenv("RESULTS_DIR", "/results")
-        
-        if not os.path.exists(db_path):
-            logger.error(f"Database file not found: {db_path}")
-            raise HTTPException(status_code=500, detail=f"Database file not found: {db_path}")
-        if not os.path.exists(transformed_data_path):
-            logger.error(f"Transformed data file not found: {transformed_data_path}")
-            raise HTTPException(status_code=500, detail=f"Transformed data file not found: {transformed_data_path}")
-
-        os.makedirs(results_dir, exist_ok=True)
-        if not os.access(results_dir, os.W_OK):
-            logger.error(f"No write permission for {results_dir}")
-            raise HTTPException(status_code=500, detail=f"No write permission for {results_dir}")
-
-        db_conn = DatabaseConnection(db_path)
-        census, state_fact = db_conn.reflect_tables()
-        
-        with open(transformed_data_path, "r") as f:
-            data = json.load(f)
-            values_list = data.get("values_list", [])
-            transformed_data = data.get("transformed_data", {})
-        
-        loader = DataLoader(db_conn.connection, census, state_fact, results_dir)
-        report_content = loader.load_data(values_list, transformed_data)
-        
-        db_conn.close_connection()
-        return {"status": "success", "message": "Data loaded and reports generated", "report": report_content}
+        return await run_db(_load_data, include_report)
     except Exception as e:
         logger.error(f"Load endpoint failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
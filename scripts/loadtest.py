@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import logging
+import os
+import random
+import time
+import httpx
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Endpoint name -> (service, method, path). Every service has its own /health
+# entry so a probe stalled behind a long request shows up on that pod.
+ENDPOINTS = {
+    "database_health": ("database", "GET", "/health"),
+    "transform_health": ("transform", "GET", "/health"),
+    "load_health": ("load", "GET", "/health"),
+    "main_health": ("main", "GET", "/health"),
+    "connect": ("database", "GET", "/connect"),
+    "export": ("database", "GET", "/export"),
+    "transform": ("transform", "POST", "/transform"),
+    "load": ("load", "POST", "/load?include_report=false"),
+    "process": ("main", "POST", "/process"),
+}
+
+# Same variables the orchestrator uses, defaulting to a local uvicorn setup
+SERVICE_URLS = {
+    "database": os.getenv("DATABASE_SERVICE", "http://localhost:8000"),
+    "transform": os.getenv("TRANSFORM_SERVICE", "http://localhost:8001"),
+    "load": os.getenv("LOAD_SERVICE", "http://localhost:8002"),
+    "main": os.getenv("MAIN_SERVICE", "http://localhost:8003"),
+}
+
+def parse_mix(mix):
+    """Parse 'load_health=8,load=1' into {'load_health': 8.0, 'load': 1.0}."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name] = float(weight or 1)
+        if weights[name] < 0:
+            raise ValueError(f"Negative weight for endpoint: {name}")
+    if not any(weights.values()):
+        raise ValueError("Request mix has no positive weights")
+    return weights
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return sorted_values[rank - 1]
+
+def summary_key(endpoint):
+    """'service METHOD /path' key of an endpoint, without the query string."""
+    service, method, path = ENDPOINTS[endpoint]
+    return f"{service} {method} {path.partition('?')[0]}"
+
+def summarize(samples, elapsed):
+    """Aggregate (endpoint, latency_seconds, ok) samples per service and path."""
+    by_endpoint = {}
+    for endpoint, latency, ok in samples:
+        by_endpoint.setdefault(endpoint, []).append((latency, ok))
+
+    summary = {}
+    for endpoint, results in sorted(by_endpoint.items(), key=lambda item: summary_key(item[0])):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, ok in results if not ok)
+        summary[summary_key(endpoint)] = {
+            "endpoint": endpoint,
+            "requests": len(results),
+            "errors": errors,
+            "error_rate": errors / len(results),
+            "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+            "latency_ms": {
+                "mean": sum(latencies) / len(latencies),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1],
+            },
+        }
+    return summary
+
+def build_apps(services):
+    """Import the FastAPI apps of the given services for in-process runs."""
+    return {service: importlib.import_module(f"scripts.{service}").app for service in services}
+
+async def run_load_test(weights, concurrency, total_requests=None, duration=None,
+                        in_process=False, timeout=300.0, seed=None):
+    """Drive the services with `concurrency` workers and return raw samples and elapsed time."""
+    rng = random.Random(seed)
+    names = list(weights)
+    services = {ENDPOINTS[name][0] for name in names}
+    samples = []
+    issued = 0
+
+    async with contextlib.AsyncExitStack() as stack:
+        clients = {}
+        if in_process:
+            for service, app in build_apps(services).items():
+                # ASGITransport does not run lifespan handlers, so enter them here
+                await stack.enter_async_context(app.router.lifespan_context(app))
+                transport = httpx.ASGITransport(app=app)
+                clients[service] = await stack.enter_async_context(
+                    httpx.AsyncClient(transport=transport, base_url=f"http://{service}", timeout=timeout))
+        else:
+            for service in services:
+                clients[service] = await stack.enter_async_context(
+                    httpx.AsyncClient(base_url=SERVICE_URLS[service], timeout=timeout))
+
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+
+        def next_endpoint():
+            nonlocal issued
+            if total_requests is not None and issued >= total_requests:
+                return None
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            issued += 1
+            return rng.choices(names, weights=[weights[name] for name in names])[0]
+
+        async def worker():
+            while (endpoint := next_endpoint()) is not None:
+                service, method, path = ENDPOINTS[endpoint]
+                request_started = time.perf_counter()
+                try:
+                    response = await clients[service].request(method, path)
+                    ok = response.status_code < 400
+                except httpx.HTTPError as e:
+                    logger.warning(f"{endpoint} request failed: {e}")
+                    ok = False
+                samples.append((endpoint, time.perf_counter() - request_started, ok))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return samples, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the census ETL services")
+    parser.add_argument("--mix", default="database_health=1",
+                        help=f"Weighted endpoint mix, e.g. load_health=8,load=1 ({', '.join(ENDPOINTS)})")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent workers")
+    parser.add_argument("--requests", type=int, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of a request count")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Drive the FastAPI apps in-process instead of running uvicorn services")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, help="Seed for the request mix")
+    parser.add_argument("--output", default=os.path.join(os.getenv("RESULTS_DIR", "results"), "loadtest.json"),
+                        help="Where to write the JSON summary")
+    args = parser.parse_args()
+
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+    weights = parse_mix(args.mix)
+
+    samples, elapsed = asyncio.run(run_load_test(
+        weights, args.concurrency, args.requests, args.duration,
+        in_process=args.in_process, timeout=args.timeout, seed=args.seed))
+
+    report = {
+        "config": {
+            "mix": weights,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "in_process": args.in_process,
+        },
+        "elapsed_seconds": elapsed,
+        "total_requests": len(samples),
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "endpoints": summarize(samples, elapsed),
+    }
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for endpoint, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        logger.info(f"{endpoint}: {stats['requests']} requests, {stats['throughput_rps']:.1f} req/s, "
+                    f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms, "
+                    f"errors={stats['error_rate']:.1%}")
+    logger.info(f"Load test report saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
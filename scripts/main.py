@@ -1,7 +1,10 @@
+import asyncio
+import functools
 import logging
 import os
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI, HTTPException
 import json
 
@@ -15,6 +18,14 @@ DATABASE_SERVICE = os.getenv("DATABASE_SERVICE", "http://database:8000")
 TRANSFORM_SERVICE = os.getenv("TRANSFORM_SERVICE", "http://transform:8001")
 LOAD_SERVICE = os.getenv("LOAD_SERVICE", "http://load:8002")
 
+# Service calls use blocking `requests`; keep them off the event loop
+pipeline_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PIPELINE_WORKERS", "2")), thread_name_prefix="pipeline")
+
+async def run_blocking(func, *args):
+    """Run a blocking call in the pipeline executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pipeline_executor, functools.partial(func, *args))
+
 def wait_for_service(url, max_retries=30, retry_interval=2):
     """Wait for a service to become available."""
     for attempt in range(max_retries):
@@ -33,63 +44,66 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
-@app.post("/process")
-async def process_data():
-    """Main endpoint to coordinate the data processing pipeline."""
-    try:
-        # Wait for all services to be available
-        services = {
-            "database": DATABASE_SERVICE,
-            "transform": TRANSFORM_SERVICE,
-            "load": LOAD_SERVICE
-        }
-        
-        for service_name, url in services.items():
-            if not wait_for_service(url):
-                raise HTTPException(
-                    status_code=503,
-                    detail=f"Service {service_name} at {url} is not available"
-                )
-
-        # Step 1: Transform data
-        logger.info("Starting data transformation")
-        transform_response = requests.post(f"{TRANSFORM_SERVICE}/transform")
-        if transform_response.status_code != 200:
+def _process_data():
+    """Run the pipeline steps; executed in pipeline_executor."""
+    # Wait for all services to be available
+    services = {
+        "database": DATABASE_SERVICE,
+        "transform": TRANSFORM_SERVICE,
+        "load": LOAD_SERVICE
+    }
+    
+    for service_name, url in services.items():
+        if not wait_for_service(url):
             raise HTTPException(
-                status_code=transform_response.status_code,
-                detail=f"Transform service failed: {transform_response.text}"
+                status_code=503,
+                detail=f"Service {service_name} at {url} is not available"
             )
-        logger.info("Data transformation completed")
 
-        # Step 2: Load data
-        logger.info("Starting data loading")
-        load_response = requests.post(f"{LOAD_SERVICE}/load")
-        if load_response.status_code != 200:
-            raise HTTPException(
-                status_code=load_response.status_code,
-                detail=f"Load service failed: {load_response.text}"
-            )
-        logger.info("Data loading completed")
+    # Step 1: Transform data
+    logger.info("Starting data transformation")
+    transform_response = requests.post(f"{TRANSFORM_SERVICE}/transform")
+    if transform_response.status_code != 200:
+        raise HTTPException(
+            status_code=transform_response.status_code,
+            detail=f"Transform service failed: {transform_response.text}"
+        )
+    logger.info("Data transformation completed")
 
-        # Read and return the final report
-        results_dir = os.getenv("RESULTS_DIR", "/results")
-        report_path = os.path.join(results_dir, "census_report.json")
-        
-        if not os.path.exists(report_path):
-            raise HTTPException(
-                status_code=500,
-                detail="Report file not found after processing"
-            )
+    # Step 2: Load data
+    logger.info("Starting data loading")
+    load_response = requests.post(f"{LOAD_SERVICE}/load")
+    if load_response.status_code != 200:
+        raise HTTPException(
+            status_code=load_response.status_code,
+            detail=f"Load service failed: {load_response.text}"
+        )
+    logger.info("Data loading completed")
+
+    # Read and return the final report
+    results_dir = os.getenv("RESULTS_DIR", "/results")
+    report_path = os.path.join(results_dir, "census_report.json")
+    
+    if not os.path.exists(report_path):
+        raise HTTPException(
+            status_code=500,
+            detail="Report file not found after processing"
+        )
 
-        with open(report_path, "r") as f:
-            report = json.load(f)
+    with open(report_path, "r") as f:
+        report = json.load(f)
 
-        return {
-            "status": "success",
-            "message": "Data processing completed successfully",
-            "report": report
-        }
+    return {
+        "status": "success",
+        "message": "Data processing completed successfully",
+        "report": report
+    }
 
+@app.post("/process")
+async def process_data():
+    """Main endpoint to coordinate the data processing pipeline."""
+    try:
+        return await run_blocking(_process_data)
     except requests.exceptions.RequestException as e:
         logger.error(f"Request failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
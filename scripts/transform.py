@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import pandas as pd
 import logging
 from sqlalchemy import create_engine, MetaData, Table, select, func, case, cast, Float, desc
@@ -5,12 +7,25 @@ from sqlalchemy import inspect
 from fastapi import FastAPI, HTTPException
 import json
 import os
+from src.compact import CompactCensus
+from src.config import MEMORY_BUDGET, QUALITY_MAX_ERROR_RATE
+from src.profiling import DataProfiler, DataQualityError
+from src.spill import describe_peak_memory, track_peak_memory, write_records_ndjson
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
 
+# Dedicated pool for blocking SQLAlchemy work so it never runs on the event loop
+db_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DB_WORKERS", "4")), thread_name_prefix="db")
+
+async def run_db(func, *args):
+    """Run a blocking database call in the dedicated executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args))
+
 class DatabaseConnection:
     def __init__(self, db_path):
         self.db_path = db_path
@@ -34,7 +49,9 @@ class DatabaseConnection:
     def reflect_tables(self):
         try:
             inspector = inspect(self.engine)
-            if 'census' not in inspector.get_table_names() or 'state_fact' not in inspector.get_table_names():
+            # After the compact layout migration census is a view
+            table_names = inspector.get_table_names() + inspector.get_view_names()
+            if 'census' not in table_names or 'state_fact' not in table_names:
                 logger.error("Required tables 'census' or 'state_fact' not found")
                 raise ValueError("Required tables 'census' or 'state_fact' not found")
             census = Table('census', self.metadata, autoload_with=self.engine)
@@ -45,60 +62,85 @@ class DatabaseConnection:
             logger.error(f"Error reflecting tables: {e}")
             raise
 
+    def reflect_compact_tables(self):
+        """Return the compact census layout if the database has been migrated"""
+        compact = CompactCensus(self.engine, self.metadata)
+        return compact if compact.exists() else None
+
     def close_connection(self):
         if self.connection:
             self.connection.close()
             logger.info("Database connection closed")
 
 class DataTransformer:
-    def __init__(self, connection, census, state_fact):
+    def __init__(self, connection, census, state_fact, memory_budget=None, chunk_rows=10000, compact=None):
         self.connection = connection
         self.census = census
         self.state_fact = state_fact
+        self.compact = compact
+        self.memory_budget = memory_budget
+        self.chunk_rows = chunk_rows
+
+    def _validate_frame(self, census_df):
+        # Coerce numeric columns in one vectorized pass instead of per-row try/except
+        numeric = census_df[['age', 'pop2000', 'pop2008']].apply(pd.to_numeric, errors='coerce')
+        valid = numeric.notna().all(axis=1) & ~numeric.isin([float('inf'), float('-inf')]).any(axis=1)
+        invalid_count = len(census_df) - int(valid.sum())
+        if invalid_count:
+            logger.warning(f"Skipped {invalid_count} rows with invalid numeric data")
+        return pd.DataFrame({
+            'state': census_df.loc[valid, 'state'].astype(str),
+            'sex': census_df.loc[valid, 'sex'].astype(str),
+            'age': numeric.loc[valid, 'age'].astype('int64'),
+            'pop2000': numeric.loc[valid, 'pop2000'].astype('int64'),
+            'pop2008': numeric.loc[valid, 'pop2008'].astype('int64')
+        }).to_dict('records')
+
+    def _validate_in_chunks(self, census_df):
+        """Yield validated records chunk by chunk so only one chunk is held at a time"""
+        for start in range(0, len(census_df), self.chunk_rows):
+            yield self._validate_frame(census_df.iloc[start:start + self.chunk_rows])
 
     def transform(self, census_df):
         logger.info("Starting data transformation")
         transformed_data = {}
         try:
-            avg_age_stmt = select(
-                self.census.c.sex,
-                (func.sum(self.census.c.pop2000 * self.census.c.age) /
-                 func.sum(self.census.c.pop2000)).label('average_age')
-            ).group_by(self.census.c.sex)
-            avg_age_results = self.connection.execute(avg_age_stmt).fetchall()
+            if self.compact is not None:
+                # Group on the integer codes of the compact layout
+                avg_age_stmt, percent_female_stmt, pop_change_stmt = self.compact.aggregate_statements()
+            else:
+                avg_age_stmt = select(
+                    self.census.c.sex,
+                    (func.sum(self.census.c.pop2000 * self.census.c.age) /
+                     func.sum(self.census.c.pop2000)).label('average_age')
+                ).group_by(self.census.c.sex)
+
+                percent_female_stmt = select(
+                    self.census.c.state,
+                    (func.sum(case(
+                        (self.census.c.sex == 'F', self.census.c.pop2000),
+                        else_=0)) /
+                     cast(func.sum(self.census.c.pop2000), Float) * 100).label('percent_female')
+                ).group_by(self.census.c.state)
+
+                pop_change_stmt = select(
+                    self.census.c.state,
+                    (func.sum(self.census.c.pop2008) - func.sum(self.census.c.pop2000)).label('pop_change')
+                ).group_by(self.census.c.state).order_by(desc('pop_change')).limit(10)
 
-            percent_female_stmt = select(
-                self.census.c.state,
-                (func.sum(case(
-                    (self.census.c.sex == 'F', self.census.c.pop2000),
-                    else_=0)) /
-                 cast(func.sum(self.census.c.pop2000), Float) * 100).label('percent_female')
-            ).group_by(self.census.c.state)
+            avg_age_results = self.connection.execute(avg_age_stmt).fetchall()
             percent_female_results = self.connection.execute(percent_female_stmt).fetchall()
-
-            pop_change_stmt = select(
-                self.census.c.state,
-                (func.sum(self.census.c.pop2008) - func.sum(self.census.c.pop2000)).label('pop_change')
-            ).group_by(self.census.c.state).order_by(desc('pop_change')).limit(10)
             pop_change_results = self.connection.execute(pop_change_stmt).fetchall()
 
             transformed_data['avg_age'] = [(row[0], float(row[1])) for row in avg_age_results]
             transformed_data['percent_female'] = [(row[0], float(row[1])) for row in percent_female_results]
             transformed_data['pop_change'] = [(row[0], int(row[1])) for row in pop_change_results]
 
-            values_list = []
-            for row in census_df.to_dict('records'):
-                try:
-                    values_list.append({
-                        'state': str(row['state']),
-                        'sex': str(row['sex']),
-                        'age': int(row['age']),
-                        'pop2000': int(row['pop2000']),
-                        'pop2008': int(row['pop2008'])
-                    })
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"Invalid data in row: {row}, error: {e}")
-                    continue
+            # Under a memory budget the records are produced lazily, one chunk at a time
+            if self.memory_budget is None:
+                values_list = self._validate_frame(census_df)
+            else:
+                values_list = self._validate_in_chunks(census_df)
 
             logger.info("Data transformation completed successfully")
             return transformed_data, values_list
@@ -106,43 +148,99 @@ class DataTransformer:
             logger.error(f"Transformation failed: {e}")
             raise
 
-@app.post("/transform")
-async def transform_data():
+def check_database(db_path):
+    """Open the database and reflect the required tables."""
+    db_conn = DatabaseConnection(db_path)
+    try:
+        db_conn.reflect_tables()
+    finally:
+        db_conn.close_connection()
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
     try:
         db_path = os.getenv("DB_PATH", "/data/census.sqlite")
-        csv_path = os.getenv("CSV_PATH", "/data/census.csv")
-        output_file = os.getenv("TRANSFORMED_DATA_PATH", "/data/transformed_data.json")
-        
-        if not os.path.exists(csv_path):
-            logger.error(f"CSV file not found: {csv_path}")
-            raise HTTPException(status_code=500, detail=f"CSV file not found: {csv_path}")
         if not os.path.exists(db_path):
-            logger.error(f"Database file not found: {db_path}")
-            raise HTTPException(status_code=500, detail=f"Database file not found: {db_path}")
-
-        output_dir = os.path.dirname(output_file)
-        os.makedirs(output_dir, exist_ok=True)
-        if not os.access(output_dir, os.W_OK):
-            logger.error(f"No write permission for {output_dir}")
-            raise HTTPException(status_code=500, detail=f"No write permission for {output_dir}")
-
-        db_conn = DatabaseConnection(db_path)
-        census, state_fact = db_conn.reflect_tables()
+            raise HTTPException(status_code=503, detail="Database file not found")
         
-        census_df = pd.read_csv(csv_path, header=None)
-        census_df.columns = ['state', 'sex', 'age', 'pop2000', 'pop2008']
-        
-        transformer = DataTransformer(db_conn.connection, census, state_fact)
-        transformed_data, values_list = transformer.transform(census_df)
-        
-        with open(output_file, "w") as f:
-            json.dump({
-                "transformed_data": transformed_data,
-                "values_list": values_list
-            }, f)
+        # Runs on the default executor so a busy db_executor cannot delay probes
+        await asyncio.to_thread(check_database, db_path)
         
+        return {"status": "healthy"}
+    except Exception as e:
+        logger.error(f"Health check failed: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+def _transform_data():
+    """Run the blocking transform step; executed in db_executor."""
+    db_path = os.getenv("DB_PATH", "/data/census.sqlite")
+    csv_path = os.getenv("CSV_PATH", "/data/census.csv")
+    output_file = os.getenv("TRANSFORMED_DATA_PATH", "/data/transformed_data.json")
+    
+    if not os.path.exists(csv_path):
+        logger.error(f"CSV file not found: {csv_path}")
+        raise HTTPException(status_code=500, detail=f"CSV file not found: {csv_path}")
+    if not os.path.exists(db_path):
+        logger.error(f"Database file not found: {db_path}")
+        raise HTTPException(status_code=500, detail=f"Database file not found: {db_path}")
+
+    output_dir = os.path.dirname(output_file)
+    os.makedirs(output_dir, exist_ok=True)
+    if not os.access(output_dir, os.W_OK):
+        logger.error(f"No write permission for {output_dir}")
+        raise HTTPException(status_code=500, detail=f"No write permission for {output_dir}")
+
+    db_conn = DatabaseConnection(db_path)
+    census, state_fact = db_conn.reflect_tables()
+    compact = db_conn.reflect_compact_tables()
+    
+    census_df = pd.read_csv(csv_path, header=None)
+    census_df.columns = ['state', 'sex', 'age', 'pop2000', 'pop2008']
+    
+    # Reject dirty files here, before the load service starts inserting
+    profiler = DataProfiler(db_conn.connection, state_fact, max_error_rate=QUALITY_MAX_ERROR_RATE)
+    quality_report = profiler.profile(census_df)
+    try:
+        profiler.enforce(quality_report)
+    except DataQualityError as e:
         db_conn.close_connection()
-        return {"status": "success", "message": "Data transformed and saved"}
+        raise HTTPException(status_code=422, detail={"error": str(e), "quality_report": quality_report.to_dict()})
+    
+    transformer = DataTransformer(db_conn.connection, census, state_fact,
+                                  memory_budget=MEMORY_BUDGET, compact=compact)
+    transformed_data, values_list = transformer.transform(census_df)
+    
+    output = {
+        "transformed_data": transformed_data,
+        "quality_report": quality_report.to_dict()
+    }
+    if MEMORY_BUDGET is None:
+        output["values_list"] = values_list
+    else:
+        # Stream the rows to an NDJSON file next to the output instead of one JSON document
+        values_path = os.path.splitext(output_file)[0] + "_values.ndjson"
+        stats = {}
+        with track_peak_memory(stats):
+            rows = write_records_ndjson(values_path, values_list)
+        logger.info(f"Wrote {rows} records to {values_path}; {describe_peak_memory(stats)}")
+        output["values_path"] = values_path
+    
+    with open(output_file, "w") as f:
+        json.dump(output, f)
+    
+    db_conn.close_connection()
+    return {"status": "success", "message": "Data transformed and saved", "quality": quality_report.summary()}
+
+@app.post("/transform")
+async def transform_data():
+    try:
+        return await run_db(_transform_data)
+    except HTTPException as e:
+        if e.status_code != 422:
+            logger.error(f"Transform endpoint failed: {e.detail}")
+            raise HTTPException(status_code=500, detail=str(e))
+        raise
     except Exception as e:
         logger.error(f"Transform endpoint failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
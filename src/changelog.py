@@ -0,0 +1,204 @@
+# src/changelog.py
+import logging
+from datetime import datetime, timezone
+from sqlalchemy import (
+    MetaData, Table, Column, Index, Integer, String,
+    select, insert, update, delete, func, case
+)
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS = 'census_load_generations'
+CHANGES = 'census_changes'
+ROLLUP = 'census_state_rollup'
+
+
+class ChangeLog:
+    """Per-load record of which (state, sex, age) keys were inserted or updated.
+
+    Every load opens a new generation; downstream caches compare the latest
+    generation with the one they were built from and refresh only the states
+    touched in between.
+    """
+
+    def __init__(self, connection, engine, metadata=None):
+        self.connection = connection
+        self.engine = engine
+        self.metadata = metadata if metadata is not None else MetaData()
+        self.generations = Table(GENERATIONS, self.metadata,
+                                 Column('generation', Integer(), primary_key=True),
+                                 Column('loaded_at', String(32), nullable=False),
+                                 Column('rows', Integer(), default=0),
+                                 extend_existing=True)
+        self.changes = Table(CHANGES, self.metadata,
+                             Column('generation', Integer(), nullable=False),
+                             Column('state', String(30), nullable=False),
+                             Column('sex', String(1), nullable=False),
+                             Column('age', Integer(), nullable=False),
+                             Column('operation', String(6), nullable=False),
+                             Index('ix_census_changes_generation', 'generation'),
+                             extend_existing=True)
+        # DDL runs on the shared connection so it never waits on its own pending writes
+        self.metadata.create_all(self.connection, tables=[self.generations, self.changes], checkfirst=True)
+
+    def begin_generation(self):
+        """Open a new load generation and return its number"""
+        result = self.connection.execute(insert(self.generations).values(
+            loaded_at=datetime.now(timezone.utc).isoformat(), rows=0))
+        generation = result.inserted_primary_key[0]
+        logger.info(f"Started load generation {generation}")
+        return generation
+
+    def record_batch(self, generation, batch, census):
+        """Log the keys of ``batch``; call before the batch is inserted into ``census``"""
+        keys = {(row['state'], row['sex'], row['age']) for row in batch}
+        if not keys:
+            return
+        existing = set()
+        states = sorted({key[0] for key in keys})
+        stmt = select(census.c.state, census.c.sex, census.c.age).distinct() \
+            .where(census.c.state.in_(states))
+        for row in self.connection.execute(stmt):
+            existing.add(tuple(row))
+
+        self.connection.execute(insert(self.changes), [{
+            'generation': generation,
+            'state': state,
+            'sex': sex,
+            'age': age,
+            'operation': 'update' if (state, sex, age) in existing else 'insert'
+        } for state, sex, age in sorted(keys)])
+        self.connection.execute(update(self.generations)
+                                .where(self.generations.c.generation == generation)
+                                .values(rows=self.generations.c.rows + len(batch)))
+
+    def latest_generation(self):
+        """Most recent generation number, or 0 before the first logged load"""
+        return self.connection.execute(select(func.max(self.generations.c.generation))).scalar() or 0
+
+    def rows_since(self, generation):
+        """Number of rows logged by loads after ``generation``"""
+        stmt = select(func.coalesce(func.sum(self.generations.c.rows), 0)) \
+            .where(self.generations.c.generation > generation)
+        return self.connection.execute(stmt).scalar()
+
+    def changes_since(self, generation):
+        """(state, sex, age, operation) rows logged after ``generation``"""
+        stmt = select(self.changes.c.state, self.changes.c.sex, self.changes.c.age,
+                      self.changes.c.operation) \
+            .where(self.changes.c.generation > generation) \
+            .order_by(self.changes.c.generation)
+        return [tuple(row) for row in self.connection.execute(stmt).fetchall()]
+
+    def affected_states(self, since_generation):
+        """States with at least one change after ``since_generation``"""
+        stmt = select(self.changes.c.state).distinct() \
+            .where(self.changes.c.generation > since_generation)
+        return {row[0] for row in self.connection.execute(stmt).fetchall()}
+
+
+class StateRollup:
+    """Per-state partial aggregates kept current from the change log.
+
+    Holds the sums behind the DataTransformer aggregates (average age by
+    sex, percent female by state, population change) so they can be derived
+    without rescanning ``census``. ``refresh`` recomputes only the states the
+    change log reports as touched since the rollup was last built.
+
+    Writes that bypass the change log (the load service, runs without
+    ``CHANGE_LOG``, inserts through the compact view) are caught by comparing
+    the census row count with the rolled-up count plus the rows logged since;
+    a mismatch triggers a full rebuild.
+    """
+
+    def __init__(self, connection, engine, census, changelog, metadata=None):
+        self.connection = connection
+        self.engine = engine
+        self.census = census
+        self.changelog = changelog
+        self.metadata = metadata if metadata is not None else changelog.metadata
+        self.table = Table(ROLLUP, self.metadata,
+                           Column('state', String(30), primary_key=True),
+                           Column('generation', Integer(), nullable=False),
+                           Column('rows', Integer()),
+                           Column('pop2000', Integer()),
+                           Column('pop2008', Integer()),
+                           Column('pop2000_f', Integer()),
+                           Column('pop2000_m', Integer()),
+                           Column('age_pop2000_f', Integer()),
+                           Column('age_pop2000_m', Integer()),
+                           extend_existing=True)
+        self.metadata.create_all(self.connection, tables=[self.table], checkfirst=True)
+
+    def _built_generation(self):
+        return self.connection.execute(select(func.max(self.table.c.generation))).scalar()
+
+    def _untracked_writes(self, built):
+        """True if ``census`` holds rows the change log does not account for"""
+        rolled_up = self.connection.execute(select(func.coalesce(func.sum(self.table.c.rows), 0))).scalar()
+        expected = rolled_up + self.changelog.rows_since(built)
+        actual = self.connection.execute(select(func.count()).select_from(self.census)).scalar()
+        return actual != expected
+
+    def refresh(self):
+        """Bring the rollup up to date; returns the set of refreshed states (None for a full rebuild)"""
+        built = self._built_generation()
+        latest = self.changelog.latest_generation()
+        if built is None:
+            states = None
+        elif self._untracked_writes(built):
+            logger.warning("Census changed outside the change log; rebuilding state rollup")
+            states = None
+        else:
+            states = self.changelog.affected_states(built)
+            if not states:
+                logger.info("State rollup is up to date")
+                return set()
+
+        c = self.census.c
+        female = c.sex == 'F'
+        male = c.sex == 'M'
+        stmt = select(
+            c.state,
+            func.count().label('rows'),
+            func.sum(c.pop2000).label('pop2000'),
+            func.sum(c.pop2008).label('pop2008'),
+            func.sum(case((female, c.pop2000), else_=0)).label('pop2000_f'),
+            func.sum(case((male, c.pop2000), else_=0)).label('pop2000_m'),
+            func.sum(case((female, c.pop2000 * c.age), else_=0)).label('age_pop2000_f'),
+            func.sum(case((male, c.pop2000 * c.age), else_=0)).label('age_pop2000_m')
+        ).group_by(c.state)
+        if states is not None:
+            stmt = stmt.where(c.state.in_(sorted(states)))
+            self.connection.execute(delete(self.table).where(self.table.c.state.in_(sorted(states))))
+        else:
+            self.connection.execute(delete(self.table))
+
+        rows = [dict(row._mapping, generation=latest) for row in self.connection.execute(stmt)]
+        if rows:
+            self.connection.execute(insert(self.table), rows)
+        logger.info(f"Refreshed state rollup for {len(rows)} states"
+                    + (" (full rebuild)" if states is None else ""))
+        return states
+
+    def aggregates(self):
+        """Derive avg_age, percent_female and pop_change from the rollup"""
+        rows = self.connection.execute(select(self.table).order_by(self.table.c.state)).fetchall()
+
+        pop_f = sum(row.pop2000_f for row in rows)
+        pop_m = sum(row.pop2000_m for row in rows)
+        avg_age = []
+        if pop_f:
+            avg_age.append(('F', sum(row.age_pop2000_f for row in rows) / pop_f))
+        if pop_m:
+            avg_age.append(('M', sum(row.age_pop2000_m for row in rows) / pop_m))
+
+        percent_female = [(row.state, row.pop2000_f / float(row.pop2000) * 100)
+                          for row in rows if row.pop2000]
+        pop_change = sorted(((row.state, row.pop2008 - row.pop2000) for row in rows),
+                            key=lambda item: item[1], reverse=True)[:10]
+        return {
+            'avg_age': avg_age,
+            'percent_female': percent_female,
+            'pop_change': pop_change
+        }
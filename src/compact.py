@@ -0,0 +1,216 @@
+# src/compact.py
+import argparse
+import logging
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String,
+    inspect, select, insert, text, func, case, cast, Float, desc
+)
+
+logger = logging.getLogger(__name__)
+
+COMPACT_CENSUS = 'census_compact'
+STATE_CODES = 'census_state_codes'
+SEX_CODES = 'census_sex_codes'
+
+
+class CompactCensus:
+    """Dictionary-encoded census layout.
+
+    ``state`` and ``sex`` are stored once in small lookup tables and the fact
+    table only carries their integer codes. After migration ``census`` is a
+    view over the compact tables, so existing readers and inserts keep working.
+    """
+
+    def __init__(self, engine, metadata=None):
+        self.engine = engine
+        self.metadata = metadata if metadata is not None else MetaData()
+        self.states = Table(STATE_CODES, self.metadata,
+                            Column('code', Integer(), primary_key=True),
+                            Column('name', String(30), nullable=False, unique=True),
+                            extend_existing=True)
+        self.sexes = Table(SEX_CODES, self.metadata,
+                           Column('code', Integer(), primary_key=True),
+                           Column('sex', String(1), nullable=False, unique=True),
+                           extend_existing=True)
+        self.census = Table(COMPACT_CENSUS, self.metadata,
+                            Column('state_code', Integer(), nullable=False),
+                            Column('sex_code', Integer(), nullable=False),
+                            Column('age', Integer()),
+                            Column('pop2000', Integer()),
+                            Column('pop2008', Integer()),
+                            extend_existing=True)
+
+    def exists(self):
+        """Return True if the database already uses the compact layout"""
+        table_names = inspect(self.engine).get_table_names()
+        return all(name in table_names for name in (COMPACT_CENSUS, STATE_CODES, SEX_CODES))
+
+    def migrate(self):
+        """Convert the wide ``census`` table into the compact layout in place"""
+        if self.exists():
+            logger.info("Census table already uses the compact layout")
+            return
+
+        logger.info("Migrating census table to the compact layout")
+        try:
+            with self.engine.begin() as conn:
+                self.metadata.create_all(conn, tables=[self.states, self.sexes, self.census])
+                conn.execute(text(
+                    f"INSERT INTO {STATE_CODES} (name) "
+                    "SELECT DISTINCT state FROM census WHERE state IS NOT NULL ORDER BY state"))
+                conn.execute(text(
+                    f"INSERT INTO {SEX_CODES} (sex) "
+                    "SELECT DISTINCT sex FROM census WHERE sex IS NOT NULL ORDER BY sex"))
+                source_rows = conn.execute(text("SELECT count(*) FROM census")).scalar()
+                result = conn.execute(text(
+                    f"INSERT INTO {COMPACT_CENSUS} (state_code, sex_code, age, pop2000, pop2008) "
+                    "SELECT s.code, x.code, c.age, c.pop2000, c.pop2008 FROM census c "
+                    f"JOIN {STATE_CODES} s ON s.name = c.state "
+                    f"JOIN {SEX_CODES} x ON x.sex = c.sex"))
+                # Rows with a NULL state or sex have no code and would be lost
+                if result.rowcount != source_rows:
+                    raise ValueError(f"Compact layout would keep {result.rowcount} of {source_rows} "
+                                     "census rows; fix rows with a missing state or sex first")
+                conn.execute(text("DROP TABLE census"))
+                self._create_compatibility_view(conn)
+            logger.info(f"Migrated {result.rowcount} census rows to the compact layout")
+            self._vacuum()
+        except Exception as e:
+            logger.error(f"Compact layout migration failed: {e}")
+            raise
+
+    def _vacuum(self):
+        """Rebuild the database file so the pages of the dropped table are released"""
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text("VACUUM"))
+        logger.info("Vacuumed database after compact layout migration")
+
+    def _create_compatibility_view(self, conn):
+        """Expose the compact tables under the original ``census`` name"""
+        conn.execute(text(
+            "CREATE VIEW census AS "
+            "SELECT s.name AS state, x.sex AS sex, c.age AS age, "
+            "c.pop2000 AS pop2000, c.pop2008 AS pop2008 "
+            f"FROM {COMPACT_CENSUS} c "
+            f"JOIN {STATE_CODES} s ON s.code = c.state_code "
+            f"JOIN {SEX_CODES} x ON x.code = c.sex_code"))
+        conn.execute(text(
+            "CREATE TRIGGER census_insert INSTEAD OF INSERT ON census "
+            "BEGIN "
+            f"INSERT OR IGNORE INTO {STATE_CODES} (name) VALUES (NEW.state); "
+            f"INSERT OR IGNORE INTO {SEX_CODES} (sex) VALUES (NEW.sex); "
+            f"INSERT INTO {COMPACT_CENSUS} (state_code, sex_code, age, pop2000, pop2008) VALUES ("
+            f"(SELECT code FROM {STATE_CODES} WHERE name = NEW.state), "
+            f"(SELECT code FROM {SEX_CODES} WHERE sex = NEW.sex), "
+            "NEW.age, NEW.pop2000, NEW.pop2008); "
+            "END"))
+
+    def aggregate_statements(self):
+        """Average age by sex, percent female by state and top population change.
+
+        Grouping happens on the integer codes; names are joined onto the
+        already aggregated rows.
+        """
+        fact = self.census
+        female_code = select(self.sexes.c.code).where(self.sexes.c.sex == 'F').scalar_subquery()
+
+        by_sex = select(
+            fact.c.sex_code,
+            (func.sum(fact.c.pop2000 * fact.c.age) /
+             func.sum(fact.c.pop2000)).label('average_age')
+        ).group_by(fact.c.sex_code).subquery()
+        avg_age_stmt = select(self.sexes.c.sex, by_sex.c.average_age) \
+            .join_from(by_sex, self.sexes, by_sex.c.sex_code == self.sexes.c.code) \
+            .order_by(self.sexes.c.sex)
+
+        by_state = select(
+            fact.c.state_code,
+            (func.sum(case(
+                (fact.c.sex_code == female_code, fact.c.pop2000),
+                else_=0)) /
+             cast(func.sum(fact.c.pop2000), Float) * 100).label('percent_female')
+        ).group_by(fact.c.state_code).subquery()
+        percent_female_stmt = self._with_state_names(by_state, by_state.c.percent_female) \
+            .order_by(self.states.c.name)
+
+        top_change = select(
+            fact.c.state_code,
+            (func.sum(fact.c.pop2008) - func.sum(fact.c.pop2000)).label('pop_change')
+        ).group_by(fact.c.state_code).order_by(desc('pop_change')).limit(10).subquery()
+        pop_change_stmt = self._with_state_names(top_change, top_change.c.pop_change) \
+            .order_by(desc(top_change.c.pop_change))
+
+        return avg_age_stmt, percent_female_stmt, pop_change_stmt
+
+    def report_statements(self):
+        """Population by state, population by age and F/M ratio by state, grouped on codes"""
+        fact = self.census
+        female_code = select(self.sexes.c.code).where(self.sexes.c.sex == 'F').scalar_subquery()
+        male_code = select(self.sexes.c.code).where(self.sexes.c.sex == 'M').scalar_subquery()
+
+        by_state = select(
+            fact.c.state_code,
+            func.sum(fact.c.pop2008).label('total_population')
+        ).group_by(fact.c.state_code).subquery()
+        pop_by_state = self._with_state_names(by_state, by_state.c.total_population) \
+            .order_by(self.states.c.name)
+
+        age_dist = select(
+            fact.c.age,
+            func.sum(fact.c.pop2008).label('population')
+        ).group_by(fact.c.age)
+
+        ratio = select(
+            fact.c.state_code,
+            (func.sum(case((fact.c.sex_code == female_code, fact.c.pop2008), else_=0)) /
+             func.sum(case((fact.c.sex_code == male_code, fact.c.pop2008), else_=0))).label('gender_ratio')
+        ).group_by(fact.c.state_code).subquery()
+        gender_ratio = self._with_state_names(ratio, ratio.c.gender_ratio) \
+            .order_by(self.states.c.name)
+
+        return pop_by_state, age_dist, gender_ratio
+
+    def _with_state_names(self, grouped, value):
+        return select(self.states.c.name.label('state'), value) \
+            .join_from(grouped, self.states, grouped.c.state_code == self.states.c.code)
+
+    def encode(self, connection, values_list):
+        """Translate wide census rows into compact rows, registering new codes"""
+        state_codes = dict(connection.execute(select(self.states.c.name, self.states.c.code)).fetchall())
+        sex_codes = dict(connection.execute(select(self.sexes.c.sex, self.sexes.c.code)).fetchall())
+
+        new_states = sorted({row['state'] for row in values_list} - state_codes.keys())
+        new_sexes = sorted({row['sex'] for row in values_list} - sex_codes.keys())
+        if new_states:
+            connection.execute(insert(self.states), [{'name': name} for name in new_states])
+            state_codes = dict(connection.execute(select(self.states.c.name, self.states.c.code)).fetchall())
+            logger.info(f"Registered {len(new_states)} new state codes")
+        if new_sexes:
+            connection.execute(insert(self.sexes), [{'sex': sex} for sex in new_sexes])
+            sex_codes = dict(connection.execute(select(self.sexes.c.sex, self.sexes.c.code)).fetchall())
+
+        return [{
+            'state_code': state_codes[row['state']],
+            'sex_code': sex_codes[row['sex']],
+            'age': row['age'],
+            'pop2000': row['pop2000'],
+            'pop2008': row['pop2008']
+        } for row in values_list]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate a census database to the compact layout")
+    parser.add_argument('db_path', help="Path to the census SQLite database")
+    args = parser.parse_args()
+
+    from src.database import DatabaseConnection
+    db_conn = DatabaseConnection(args.db_path)
+    try:
+        CompactCensus(db_conn.engine).migrate()
+    finally:
+        db_conn.close_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,18 @@
+# src/config.py
+import os
+
+# Memory budget in MiB for the transform and load stages. Unset keeps every
+# stage fully in memory; when set, validated rows are chunked and spilled to
+# SPILL_DIR (system temp dir by default) once the budget is exceeded.
+MEMORY_BUDGET_MB = os.getenv("MEMORY_BUDGET_MB")
+MEMORY_BUDGET = int(float(MEMORY_BUDGET_MB) * 2**20) if MEMORY_BUDGET_MB else None
+SPILL_DIR = os.getenv("SPILL_DIR") or None
+
+# Maximum fraction of invalid rows an input file may contain before the
+# data-quality gate rejects it ahead of any insert. Unset disables rejection.
+QUALITY_MAX_ERROR_RATE_RAW = os.getenv("QUALITY_MAX_ERROR_RATE", "0.05")
+QUALITY_MAX_ERROR_RATE = float(QUALITY_MAX_ERROR_RATE_RAW) if QUALITY_MAX_ERROR_RATE_RAW else None
+
+# Record a change log per load and keep per-state rollups, so aggregates only
+# rescan the states touched since the previous run.
+CHANGE_LOG = os.getenv("CHANGE_LOG", "").lower() in ("1", "true", "yes")
@@ -2,6 +2,7 @@
 import os
 from sqlalchemy import create_engine, MetaData, Table
 import logging
+from src.compact import CompactCensus
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +35,14 @@ class DatabaseConnection:
             logger.error(f"Error reflecting tables: {e}")
             raise
 
+    def reflect_compact_tables(self):
+        """Return the compact census layout if the database has been migrated"""
+        compact = CompactCensus(self.engine, self.metadata)
+        if not compact.exists():
+            return None
+        logger.info("Using compact census layout")
+        return compact
+
     def close_connection(self):
         """Close the database connection"""
         if self.connection:
@@ -0,0 +1,231 @@
+# src/explorer.py
+import logging
+from dataclasses import dataclass, replace
+import pandas as pd
+from sqlalchemy import Float, select, func, case, cast, desc, asc, and_, or_
+
+logger = logging.getLogger(__name__)
+
+GROUP_COLUMNS = ('state', 'sex', 'age')
+SCAN_COLUMNS = ['state', 'sex', 'age', 'pop2000', 'pop2008']
+
+# Every metric is derived from the same per-group sums (pop2000, pop2008,
+# age_pop2000, female_pop2000, rows), so one aggregation feeds any set of metrics
+METRICS = {
+    'pop2000': lambda b, div: b['pop2000'],
+    'pop2008': lambda b, div: b['pop2008'],
+    'pop_change': lambda b, div: b['pop2008'] - b['pop2000'],
+    'pct_change': lambda b, div: div(b['pop2008'] - b['pop2000'], b['pop2000']) * 100,
+    'avg_age': lambda b, div: div(b['age_pop2000'], b['pop2000']),
+    'percent_female': lambda b, div: div(b['female_pop2000'], b['pop2000']) * 100,
+    'rows': lambda b, div: b['rows'],
+}
+
+
+@dataclass(frozen=True)
+class CensusQuery:
+    """Immutable, lazily evaluated query over the census table.
+
+    Each builder method returns a new query; nothing touches the database
+    until ``collect`` (or ``CensusExplorer.collect_many``) is called.
+    """
+    explorer: object
+    filters: tuple = ()
+    groups: tuple = ()
+    metrics: tuple = ()
+    order: tuple = ()
+    row_limit: int = None
+
+    @property
+    def shape(self):
+        """Hashable description of the query, used as the memoization key"""
+        return (self.filters, self.groups, self.metrics, self.order, self.row_limit)
+
+    def where(self, state=None, sex=None, age=None):
+        """Filter on state/sex (a value or a list of values) or age (a value, list or (min, max) range)"""
+        filters = list(self.filters)
+        for column, value in (('state', state), ('sex', sex), ('age', age)):
+            if value is None:
+                continue
+            if column == 'age' and isinstance(value, tuple):
+                filters.append((column, 'between', value))
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                filters.append((column, 'in', tuple(sorted(value))))
+            else:
+                filters.append((column, 'in', (value,)))
+        return replace(self, filters=tuple(sorted(set(filters))))
+
+    def group_by(self, *columns):
+        unknown = set(columns) - set(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot group by: {', '.join(sorted(unknown))}")
+        return replace(self, groups=self.groups + tuple(c for c in columns if c not in self.groups))
+
+    def metric(self, *names):
+        unknown = set(names) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metric: {', '.join(sorted(unknown))}")
+        return replace(self, metrics=self.metrics + tuple(n for n in names if n not in self.metrics))
+
+    def order_by(self, column, descending=True):
+        if column not in GROUP_COLUMNS and column not in METRICS:
+            raise ValueError(f"Cannot order by: {column}")
+        return replace(self, order=(column, descending))
+
+    def limit(self, n):
+        return replace(self, row_limit=n)
+
+    def collect(self):
+        """Execute the query and return a DataFrame"""
+        return self.explorer.collect(self)
+
+
+def _sql_div(numerator, denominator):
+    return cast(numerator, Float) / func.nullif(denominator, 0)
+
+
+def _frame_div(numerator, denominator):
+    return numerator / denominator.where(denominator != 0)
+
+
+def _filter_mask(frame, filters):
+    mask = pd.Series(True, index=frame.index)
+    for column, op, value in filters:
+        if op == 'between':
+            mask &= frame[column].between(*value)
+        else:
+            mask &= frame[column].isin(value)
+    return mask
+
+
+class CensusExplorer:
+    """Library entry point for ad-hoc questions about the census data.
+
+    Queries compile either to a single SQL GROUP BY (``engine='sql'``) or to
+    one vectorized pandas pass over a scanned frame (``engine='pandas'``).
+    Results are memoized per query shape. With a ChangeLog the cache is
+    keyed on the load generation; without one it is keyed on the census row
+    count, so appended rows invalidate it but an in-place update does not
+    (call ``clear_cache`` after one).
+    """
+
+    def __init__(self, connection, census, engine='sql', changelog=None):
+        if engine not in ('sql', 'pandas'):
+            raise ValueError(f"Unknown explorer engine: {engine}")
+        self.connection = connection
+        self.census = census
+        self.engine = engine
+        self.changelog = changelog
+        self._cache = {}
+        self.scans = 0
+
+    def query(self):
+        return CensusQuery(self)
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _cache_key(self, query, engine):
+        if self.changelog is not None:
+            version = self.changelog.latest_generation()
+        else:
+            version = self.connection.execute(select(func.count()).select_from(self.census)).scalar()
+        return (engine, version, query.shape)
+
+    def _where_clause(self, filters):
+        c = self.census.c
+        clauses = []
+        for column, op, value in filters:
+            if op == 'between':
+                clauses.append(c[column].between(*value))
+            else:
+                clauses.append(c[column].in_(value))
+        return and_(*clauses)
+
+    def compile(self, query):
+        """Compile the whole chain into one SELECT"""
+        c = self.census.c
+        base = {
+            'pop2000': func.sum(c.pop2000),
+            'pop2008': func.sum(c.pop2008),
+            'age_pop2000': func.sum(c.pop2000 * c.age),
+            'female_pop2000': func.sum(case((c.sex == 'F', c.pop2000), else_=0)),
+            'rows': func.count(),
+        }
+        metrics = query.metrics or ('pop2008',)
+        columns = [c[group] for group in query.groups] + \
+                  [METRICS[name](base, _sql_div).label(name) for name in metrics]
+
+        stmt = select(*columns)
+        if query.filters:
+            stmt = stmt.where(self._where_clause(query.filters))
+        if query.groups:
+            stmt = stmt.group_by(*[c[group] for group in query.groups])
+        if query.order:
+            column, descending = query.order
+            stmt = stmt.order_by(desc(column) if descending else asc(column))
+        elif query.groups:
+            stmt = stmt.order_by(*[c[group] for group in query.groups])
+        if query.row_limit is not None:
+            stmt = stmt.limit(query.row_limit)
+        return stmt
+
+    def _run_sql(self, query):
+        self.scans += 1
+        result = self.connection.execute(self.compile(query))
+        return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+    def _scan(self, queries):
+        """Read the rows needed by ``queries`` in a single pass"""
+        stmt = select(*[self.census.c[column] for column in SCAN_COLUMNS])
+        if all(query.filters for query in queries):
+            stmt = stmt.where(or_(*[self._where_clause(query.filters) for query in queries]))
+        self.scans += 1
+        return pd.DataFrame(self.connection.execute(stmt).fetchall(), columns=SCAN_COLUMNS)
+
+    def _evaluate(self, frame, query):
+        """Evaluate a query over a scanned frame with vectorized pandas operations"""
+        frame = frame[_filter_mask(frame, query.filters)]
+        sums = pd.DataFrame({
+            'pop2000': frame['pop2000'],
+            'pop2008': frame['pop2008'],
+            'age_pop2000': frame['pop2000'] * frame['age'],
+            'female_pop2000': frame['pop2000'].where(frame['sex'] == 'F', 0),
+            'rows': 1,
+        }, index=frame.index)
+        if query.groups:
+            base = sums.groupby([frame[group] for group in query.groups]).sum()
+        else:
+            base = sums.sum().to_frame().T
+
+        metrics = query.metrics or ('pop2008',)
+        result = pd.DataFrame({name: METRICS[name](base, _frame_div) for name in metrics}, index=base.index)
+        result = result.reset_index() if query.groups else result.reset_index(drop=True)
+
+        if query.order:
+            column, descending = query.order
+            result = result.sort_values(column, ascending=not descending, kind='stable')
+        if query.row_limit is not None:
+            result = result.head(query.row_limit)
+        return result.reset_index(drop=True)
+
+    def collect(self, query):
+        """Execute one query, reusing a memoized result for the same shape"""
+        key = self._cache_key(query, self.engine)
+        if key not in self._cache:
+            if self.engine == 'sql':
+                self._cache[key] = self._run_sql(query)
+            else:
+                self._cache[key] = self._evaluate(self._scan([query]), query)
+        return self._cache[key].copy()
+
+    def collect_many(self, *queries):
+        """Execute several queries over one shared scan of the census table"""
+        keys = [self._cache_key(query, 'pandas') for query in queries]
+        pending = {key: query for key, query in zip(keys, queries) if key not in self._cache}
+        if pending:
+            frame = self._scan(list(pending.values()))
+            for key, query in pending.items():
+                self._cache[key] = self._evaluate(frame, query)
+            logger.info(f"Evaluated {len(pending)} queries over one scan of {len(frame)} rows")
+        return [self._cache[key].copy() for key in keys]
@@ -2,17 +2,56 @@
 import os
 from sqlalchemy import create_engine, MetaData, Table, Column, String, Integer, Float, Boolean
 from sqlalchemy import insert, update
-import matplotlib.pyplot as plt
 import logging
+from contextlib import nullcontext
+from src.report import CensusReport, ReportWriter
+from src.spill import SpilledRecords, describe_peak_memory, estimate_records_bytes, track_peak_memory
+from src.visualization import Visualizer
 
 logger = logging.getLogger(__name__)
 
 class DataLoader:
-    def __init__(self, connection, engine, results_dir):
+    def __init__(self, connection, engine, results_dir, compact=None, memory_budget=None,
+                 changelog=None):
         self.engine = engine
         self.connection = connection
         self.metadata = MetaData()  # Make sure to initialize metadata here
         self.results_dir = results_dir
+        self.compact = compact
+        self.memory_budget = memory_budget
+        self.changelog = changelog
+        self.last_run_stats = {}
+
+    def _iter_batches(self, values_list):
+        """Split the records into insert batches that fit the memory budget"""
+        if isinstance(values_list, SpilledRecords):
+            yield from values_list
+        elif self.memory_budget is None or not values_list:
+            yield values_list
+        else:
+            row_bytes = max(1, estimate_records_bytes(values_list[:1]))
+            batch_rows = max(1, self.memory_budget // row_bytes)
+            for start in range(0, len(values_list), batch_rows):
+                yield values_list[start:start + batch_rows]
+
+    def _insert_records(self, values_list, census):
+        """Insert the validated records batch by batch, returning the row count"""
+        inserted = 0
+        generation = self.changelog.begin_generation() if self.changelog is not None else None
+        for batch in self._iter_batches(values_list):
+            if not batch:
+                continue
+            if generation is not None:
+                self.changelog.record_batch(generation, batch, census)
+            if self.compact is not None:
+                result = self.connection.execute(insert(self.compact.census),
+                                                 self.compact.encode(self.connection, batch))
+            else:
+                result = self.connection.execute(insert(census), batch)
+            inserted += result.rowcount
+        if generation is not None:
+            self.last_run_stats['generation'] = generation
+        return inserted
 
     def load(self, transformed_data, values_list, census, state_fact):
         """Load phase: Store transformed data and generate report"""
@@ -26,40 +65,25 @@ class DataLoader:
                           Column('valid', Boolean(), default=False))
             self.metadata.create_all(self.engine, checkfirst=True)
 
+            self.last_run_stats = {}
             if values_list:
-                insert_stmt = insert(census)
-                result = self.connection.execute(insert_stmt, values_list)
-                logger.info(f"Inserted {result.rowcount} records into census table")
+                tracker = track_peak_memory(self.last_run_stats) if self.memory_budget is not None else nullcontext()
+                with tracker:
+                    inserted = self._insert_records(values_list, census)
+                target = 'compact census' if self.compact is not None else 'census'
+                logger.info(f"Inserted {inserted} records into {target} table")
+                if self.memory_budget is not None:
+                    logger.info(f"Load {describe_peak_memory(self.last_run_stats)}")
 
             update_stmt = update(state_fact).values(notes='The Wild West') \
                 .where(state_fact.c.census_region_name == 'West')
             update_result = self.connection.execute(update_stmt)
             logger.info(f"Updated {update_result.rowcount} records in state_fact table")
 
-            report_content = "# Census Analysis Report\n\n"
-            report_content += "## Average Age by Gender\n"
-            for sex, avg_age in transformed_data['avg_age']:
-                report_content += f"- {sex}: {avg_age:.2f}\n"
-
-            report_content += "\n## Percentage Female by State\n"
-            for state, percent in transformed_data['percent_female']:
-                report_content += f"- {state}: {percent:.2f}%\n"
-
-            report_content += "\n## Top 10 States by Population Change\n"
-            for state, change in transformed_data['pop_change']:
-                report_content += f"- {state}: {change:,}\n"
+            report = CensusReport.from_aggregates(transformed_data)
+            report_content = ReportWriter(self.results_dir).write(report)
 
-            plt.figure(figsize=(10, 6))
-            states = [row[0] for row in transformed_data['pop_change']]
-            changes = [row[1] for row in transformed_data['pop_change']]
-            plt.bar(states, changes)
-            plt.xticks(rotation=45)
-            plt.title('Top 10 States by Population Change')
-            plt.xlabel('State')
-            plt.ylabel('Population Change')
-            plt.tight_layout()
-            plt.savefig(f'{self.results_dir}/pop_change_plot.png')
-            plt.close()
+            Visualizer(self.results_dir).plot_population_change(transformed_data['pop_change'])
 
             logger.info("Data loading and report generation completed successfully")
             return report_content
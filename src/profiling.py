@@ -0,0 +1,122 @@
+# src/profiling.py
+import json
+import logging
+from dataclasses import dataclass, field, asdict
+import pandas as pd
+from sqlalchemy import select
+
+logger = logging.getLogger(__name__)
+
+CENSUS_COLUMNS = ['state', 'sex', 'age', 'pop2000', 'pop2008']
+NUMERIC_COLUMNS = ['age', 'pop2000', 'pop2008']
+KEY_COLUMNS = ['state', 'sex', 'age']
+
+
+class DataQualityError(ValueError):
+    """Raised when an input file fails the data-quality gate"""
+
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+@dataclass
+class QualityReport:
+    rows: int
+    invalid_rows: int
+    null_counts: dict = field(default_factory=dict)
+    non_numeric: dict = field(default_factory=dict)
+    out_of_range_ages: int = 0
+    unknown_sex_codes: dict = field(default_factory=dict)
+    unknown_states: dict = field(default_factory=dict)
+    duplicate_keys: int = 0
+    negative_populations: int = 0
+
+    @property
+    def error_rate(self):
+        return self.invalid_rows / self.rows if self.rows else 0.0
+
+    def to_dict(self):
+        report = asdict(self)
+        report['error_rate'] = self.error_rate
+        return report
+
+    def summary(self):
+        """One-line description for the logs"""
+        return (f"{self.rows} rows, {self.invalid_rows} invalid ({self.error_rate:.2%}); "
+                f"nulls={sum(self.null_counts.values())}, "
+                f"non_numeric={sum(self.non_numeric.values())}, "
+                f"bad_ages={self.out_of_range_ages}, "
+                f"unknown_sex={sum(self.unknown_sex_codes.values())}, "
+                f"unknown_states={sum(self.unknown_states.values())}, "
+                f"duplicates={self.duplicate_keys}, "
+                f"negative_pops={self.negative_populations}")
+
+
+class DataProfiler:
+    """Vectorized data-quality checks on an extracted census frame.
+
+    Every check is a column-wise pandas operation over the whole frame, so
+    dirty files are measured in one pass instead of failing row by row.
+    States missing from ``state_fact`` are reported but do not make a row
+    invalid, since the reference table is known to be incomplete.
+    """
+
+    def __init__(self, connection, state_fact, min_age=0, max_age=85,
+                 valid_sexes=('M', 'F'), max_error_rate=None):
+        self.connection = connection
+        self.state_fact = state_fact
+        self.min_age = min_age
+        self.max_age = max_age
+        self.valid_sexes = valid_sexes
+        self.max_error_rate = max_error_rate
+
+    def _known_states(self):
+        rows = self.connection.execute(select(self.state_fact.c.name)).fetchall()
+        return {row[0] for row in rows}
+
+    def profile(self, census_df):
+        """Compute the quality report for ``census_df``"""
+        logger.info("Starting data-quality profiling")
+        nulls = census_df[CENSUS_COLUMNS].isna()
+        numeric = census_df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors='coerce')
+        non_numeric = numeric.isna() & ~nulls[NUMERIC_COLUMNS]
+
+        bad_age = numeric['age'].notna() & ~numeric['age'].between(self.min_age, self.max_age)
+        unknown_sex = census_df['sex'].notna() & ~census_df['sex'].isin(self.valid_sexes)
+        negative_pop = (numeric[['pop2000', 'pop2008']] < 0).any(axis=1)
+        duplicate = census_df.duplicated(subset=KEY_COLUMNS, keep='first')
+        unknown_state = census_df['state'].notna() & ~census_df['state'].isin(self._known_states())
+
+        invalid = nulls.any(axis=1) | non_numeric.any(axis=1) | bad_age | unknown_sex | negative_pop | duplicate
+
+        report = QualityReport(
+            rows=len(census_df),
+            invalid_rows=int(invalid.sum()),
+            null_counts={column: int(count) for column, count in nulls.sum().items() if count},
+            non_numeric={column: int(count) for column, count in non_numeric.sum().items() if count},
+            out_of_range_ages=int(bad_age.sum()),
+            unknown_sex_codes={str(code): int(count) for code, count in
+                               census_df.loc[unknown_sex, 'sex'].value_counts().items()},
+            unknown_states={str(state): int(count) for state, count in
+                            census_df.loc[unknown_state, 'state'].value_counts().items()},
+            duplicate_keys=int(duplicate.sum()),
+            negative_populations=int(negative_pop.sum())
+        )
+        logger.info(f"Data-quality profile: {report.summary()}")
+        return report
+
+    def enforce(self, report):
+        """Raise DataQualityError if the report exceeds ``max_error_rate``"""
+        if self.max_error_rate is not None and report.error_rate > self.max_error_rate:
+            message = (f"Rejected input: {report.error_rate:.2%} invalid rows exceeds "
+                       f"the {self.max_error_rate:.2%} limit")
+            logger.error(message)
+            raise DataQualityError(message, report)
+        return report
+
+
+def save_quality_report(report, path):
+    """Write the quality report as JSON"""
+    with open(path, 'w') as f:
+        json.dump(report.to_dict(), f, indent=2)
@@ -0,0 +1,154 @@
+# src/report.py
+import os
+import io
+import json
+import html
+import hashlib
+import logging
+from decimal import Decimal
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Aggregate key -> (section title, value format), in report order
+REPORT_SECTIONS = {
+    'avg_age': ('Average Age by Gender', '{:.2f}'),
+    'percent_female': ('Percentage Female by State', '{:.2f}%'),
+    'pop_change': ('Top 10 States by Population Change', '{:,}'),
+    'population_by_state': ('Total Population by State', '{:,}'),
+    'age_distribution': ('Population by Age', '{:,}'),
+    'gender_ratio': ('Gender Ratio (F/M) by State', '{:.3f}'),
+}
+
+
+def _plain(value):
+    """Convert SQL/numpy scalars (Decimal, numpy int/float) to JSON-serializable Python values"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+@dataclass
+class ReportSection:
+    key: str
+    title: str
+    rows: list
+    value_format: str = '{}'
+
+    def fingerprint(self):
+        """Hash of everything the rendered section depends on"""
+        payload = json.dumps([self.title, self.value_format, self.rows], default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def render_markdown(self):
+        out = io.StringIO()
+        out.write(f"## {self.title}\n")
+        for label, value in self.rows:
+            out.write(f"- {label}: {self.value_format.format(value)}\n")
+        return out.getvalue()
+
+    def render_html(self):
+        out = io.StringIO()
+        out.write(f"<h2>{html.escape(self.title)}</h2>\n<ul>\n")
+        for label, value in self.rows:
+            out.write(f"<li>{html.escape(str(label))}: {html.escape(self.value_format.format(value))}</li>\n")
+        out.write("</ul>\n")
+        return out.getvalue()
+
+
+@dataclass
+class CensusReport:
+    sections: list = field(default_factory=list)
+    title: str = 'Census Analysis Report'
+
+    @classmethod
+    def from_aggregates(cls, aggregates):
+        """Build the report from aggregate results keyed like REPORT_SECTIONS"""
+        report = cls()
+        for key, (title, value_format) in REPORT_SECTIONS.items():
+            if key in aggregates:
+                rows = [[_plain(row[0]), _plain(row[1])] for row in aggregates[key]]
+                report.sections.append(ReportSection(key, title, rows, value_format))
+        return report
+
+
+class ReportWriter:
+    """Render a CensusReport to Markdown, JSON and HTML in one pass.
+
+    Rendered fragments are cached next to the outputs together with each
+    section's fingerprint, so only sections whose aggregates changed are
+    re-rendered and the files are left untouched when nothing changed.
+    """
+
+    def __init__(self, results_dir, basename='census_report'):
+        self.results_dir = results_dir
+        self.basename = basename
+        self.state_path = os.path.join(results_dir, f'.{basename}_state.json')
+        self.changed_sections = []
+
+    def _path(self, extension):
+        return os.path.join(self.results_dir, f'{self.basename}.{extension}')
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f).get('sections', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path, content):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def write(self, report):
+        """Write all formats for the report and return the Markdown content"""
+        cached = self._load_state()
+        state = {}
+        self.changed_sections = []
+
+        markdown = io.StringIO()
+        markdown.write(f"# {report.title}\n\n")
+        page = io.StringIO()
+        page.write(f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\">"
+                   f"<title>{html.escape(report.title)}</title></head>\n<body>\n"
+                   f"<h1>{html.escape(report.title)}</h1>\n")
+        document = {}
+
+        for index, section in enumerate(report.sections):
+            fingerprint = section.fingerprint()
+            entry = cached.get(section.key)
+            if entry is None or entry.get('fingerprint') != fingerprint:
+                entry = {
+                    'fingerprint': fingerprint,
+                    'md': section.render_markdown(),
+                    'html': section.render_html()
+                }
+                self.changed_sections.append(section.key)
+            state[section.key] = entry
+
+            if index:
+                markdown.write("\n")
+            markdown.write(entry['md'])
+            page.write(entry['html'])
+            document[section.key] = section.rows
+
+        page.write("</body>\n</html>\n")
+        markdown_content = markdown.getvalue()
+
+        outputs = {extension: self._path(extension) for extension in ('md', 'json', 'html')}
+        unchanged = (not self.changed_sections and state.keys() == cached.keys()
+                     and all(os.path.exists(path) for path in outputs.values()))
+        if unchanged:
+            logger.info("Report sections unchanged; keeping existing report files")
+            return markdown_content
+
+        self._write(outputs['md'], markdown_content)
+        self._write(outputs['json'], json.dumps(document))
+        self._write(outputs['html'], page.getvalue())
+        self._write(self.state_path, json.dumps({'sections': state}))
+        logger.info(f"Report written; re-rendered sections: {', '.join(self.changed_sections) or 'none'}")
+        return markdown_content
@@ -0,0 +1,154 @@
+# src/spill.py
+import os
+import sys
+import json
+import pickle
+import tempfile
+import logging
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_records_bytes(records):
+    """Rough in-memory size of a list of flat record dicts, sampled from the first row"""
+    if not records:
+        return 0
+    sample = records[0]
+    row_bytes = sys.getsizeof(sample) + sum(
+        sys.getsizeof(key) + sys.getsizeof(value) for key, value in sample.items())
+    return sys.getsizeof(records) + row_bytes * len(records)
+
+
+def write_records_ndjson(path, chunks):
+    """Write record chunks to ``path`` as NDJSON one chunk at a time; returns the row count.
+
+    The file is written next to ``path`` and renamed into place, so readers
+    never see a partially written file.
+    """
+    rows = 0
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        for chunk in chunks:
+            for record in chunk:
+                f.write(json.dumps(record))
+                f.write('\n')
+            rows += len(chunk)
+    os.replace(tmp_path, path)
+    return rows
+
+
+def iter_records_ndjson(path, memory_budget=None):
+    """Read an NDJSON records file back in batches whose estimated size fits ``memory_budget``.
+
+    Without a budget the whole file is returned as a single batch.
+    """
+    batch = []
+    batch_rows = None
+    with open(path) as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if memory_budget is None:
+                continue
+            if batch_rows is None:
+                batch_rows = max(1, memory_budget // max(1, estimate_records_bytes(batch)))
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def peak_rss_bytes():
+    """High-water resident set size of this process, or None where getrusage is unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@contextmanager
+def track_peak_memory(stats):
+    """Record the process peak RSS after the block in ``stats['peak_rss_bytes']``.
+
+    getrusage adds no per-allocation overhead, unlike tracemalloc, and the
+    process-wide high-water mark is what an OOM kill is based on. It never
+    decreases, so a run only shows a new peak if it exceeded earlier ones.
+    """
+    try:
+        yield stats
+    finally:
+        stats['peak_rss_bytes'] = peak_rss_bytes()
+
+
+def describe_peak_memory(stats):
+    """Log-friendly form of the peak recorded by ``track_peak_memory``"""
+    peak = stats.get('peak_rss_bytes')
+    return f"peak RSS {peak / 2**20:.1f} MiB" if peak is not None else "peak RSS unavailable"
+
+
+class SpilledRecords:
+    """Ordered chunks of validated records kept under a memory budget.
+
+    Chunks stay in memory while their estimated size fits the budget; once it
+    is exceeded the oldest in-memory chunks are pickled to a temporary
+    directory. Iterating yields the chunks back in insertion order.
+    """
+
+    def __init__(self, memory_budget, spill_dir=None):
+        self.memory_budget = memory_budget
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='census_spill_', dir=spill_dir)
+        self._chunks = []  # [records list] or [file path] in insertion order
+        self._in_memory_bytes = 0
+        self.rows = 0
+        self.spilled_chunks = 0
+        self.spilled_bytes = 0
+
+    def append(self, records):
+        """Add a chunk of records, spilling older chunks if the budget is exceeded"""
+        if not records:
+            return
+        self._chunks.append(records)
+        self._in_memory_bytes += estimate_records_bytes(records)
+        self.rows += len(records)
+
+        for index, chunk in enumerate(self._chunks):
+            if self._in_memory_bytes <= self.memory_budget:
+                break
+            if isinstance(chunk, list):
+                self._chunks[index] = self._spill(chunk)
+
+    def _spill(self, chunk):
+        path = os.path.join(self._tmpdir.name, f'chunk_{self.spilled_chunks:06d}.pkl')
+        with open(path, 'wb') as f:
+            pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._in_memory_bytes -= estimate_records_bytes(chunk)
+        self.spilled_chunks += 1
+        self.spilled_bytes += os.path.getsize(path)
+        logger.debug(f"Spilled {len(chunk)} records to {path}")
+        return path
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if isinstance(chunk, list):
+                yield chunk
+            else:
+                with open(chunk, 'rb') as f:
+                    yield pickle.load(f)
+
+    def __len__(self):
+        return self.rows
+
+    def __bool__(self):
+        return self.rows > 0
+
+    def close(self):
+        """Remove spilled chunk files"""
+        self._chunks = []
+        self._in_memory_bytes = 0
+        self._tmpdir.cleanup()
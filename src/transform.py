@@ -1,69 +1,122 @@
 # src/transform.py
+import numpy as np
 import pandas as pd
 import logging
+from contextlib import nullcontext
 from sqlalchemy import (
     String, Integer, Float, Boolean,
     select, func, case, cast, desc
 )
+from src.spill import SpilledRecords, describe_peak_memory, track_peak_memory
 
 
 logger = logging.getLogger(__name__)
 
 class DataTransformer:
-    def __init__(self, connection, census, state_fact):
+    def __init__(self, connection, census, state_fact, compact=None,
+                 memory_budget=None, chunk_rows=10000, spill_dir=None, rollup=None):
         self.connection = connection
         self.census = census
         self.state_fact = state_fact
+        self.compact = compact
+        self.memory_budget = memory_budget
+        self.chunk_rows = chunk_rows
+        self.spill_dir = spill_dir
+        self.rollup = rollup
+        self.last_run_stats = {}
+
+    def _statements(self):
+        """Aggregate queries over the wide census table"""
+        avg_age_stmt = select(
+            self.census.c.sex,
+            (func.sum(self.census.c.pop2000 * self.census.c.age) /
+             func.sum(self.census.c.pop2000)).label('average_age')
+        ).group_by(self.census.c.sex)
+
+        percent_female_stmt = select(
+            self.census.c.state,
+            (func.sum(case(
+                (self.census.c.sex == 'F', self.census.c.pop2000),
+                else_=0)) /
+             cast(func.sum(self.census.c.pop2000), Float) * 100).label('percent_female')
+        ).group_by(self.census.c.state)
+
+        pop_change_stmt = select(
+            self.census.c.state,
+            (func.sum(self.census.c.pop2008) - func.sum(self.census.c.pop2000)).label('pop_change')
+        ).group_by(self.census.c.state).order_by(desc('pop_change')).limit(10)
+
+        return avg_age_stmt, percent_female_stmt, pop_change_stmt
+
+    def _validate_frame(self, census_df):
+        """Coerce extracted rows to census records, dropping invalid ones in one vectorized pass"""
+        numeric = census_df[['age', 'pop2000', 'pop2008']].apply(pd.to_numeric, errors='coerce')
+        valid = numeric.notna().all(axis=1) & ~numeric.isin([np.inf, -np.inf]).any(axis=1)
+
+        invalid_count = len(census_df) - int(valid.sum())
+        if invalid_count:
+            sample = census_df.index[~valid][:5].tolist()
+            logger.warning(f"Skipped {invalid_count} rows with invalid numeric data (e.g. rows {sample})")
+
+        return pd.DataFrame({
+            'state': census_df.loc[valid, 'state'].astype(str),
+            'sex': census_df.loc[valid, 'sex'].astype(str),
+            'age': numeric.loc[valid, 'age'].astype('int64'),
+            'pop2000': numeric.loc[valid, 'pop2000'].astype('int64'),
+            'pop2008': numeric.loc[valid, 'pop2008'].astype('int64')
+        }).to_dict('records')
+
+    def _validate_in_chunks(self, census_df):
+        """Validate the frame chunk by chunk into a SpilledRecords under the memory budget"""
+        values_list = SpilledRecords(self.memory_budget, self.spill_dir)
+        for start in range(0, len(census_df), self.chunk_rows):
+            chunk = census_df.iloc[start:start + self.chunk_rows]
+            values_list.append(self._validate_frame(chunk))
+        self.last_run_stats.update({
+            'rows': values_list.rows,
+            'spilled_chunks': values_list.spilled_chunks,
+            'spilled_bytes': values_list.spilled_bytes
+        })
+        return values_list
 
     def transform(self, census_df):
         """Transform phase: Process and analyze the extracted data"""
         logger.info("Starting data transformation")
         transformed_data = {}
+        self.last_run_stats = {}
+        tracker = track_peak_memory(self.last_run_stats) if self.memory_budget is not None else nullcontext()
 
         try:
-            avg_age_stmt = select(
-                self.census.c.sex,
-                (func.sum(self.census.c.pop2000 * self.census.c.age) /
-                 func.sum(self.census.c.pop2000)).label('average_age')
-            ).group_by(self.census.c.sex)
-            avg_age_results = self.connection.execute(avg_age_stmt).fetchall()
-
-            percent_female_stmt = select(
-                self.census.c.state,
-                (func.sum(case(
-                    (self.census.c.sex == 'F', self.census.c.pop2000),
-                    else_=0)) /
-                 cast(func.sum(self.census.c.pop2000), Float) * 100).label('percent_female')
-            ).group_by(self.census.c.state)
-            percent_female_results = self.connection.execute(percent_female_stmt).fetchall()
-
-            pop_change_stmt = select(
-                self.census.c.state,
-                (func.sum(self.census.c.pop2008) - func.sum(self.census.c.pop2000)).label('pop_change')
-            ).group_by(self.census.c.state).order_by(desc('pop_change')).limit(10)
-            pop_change_results = self.connection.execute(pop_change_stmt).fetchall()
-
-            transformed_data['avg_age'] = avg_age_results
-            transformed_data['percent_female'] = percent_female_results
-            transformed_data['pop_change'] = pop_change_results
-
-            values_list = []
-            for row in census_df.to_dict('records'):
-                try:
-                    values_list.append({
-                        'state': str(row['state']),
-                        'sex': str(row['sex']),
-                        'age': int(row['age']),
-                        'pop2000': int(row['pop2000']),
-                        'pop2008': int(row['pop2008'])
-                    })
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"Invalid data in row: {row}, error: {e}")
-                    continue
+            with tracker:
+                if self.rollup is not None:
+                    # Only states touched since the last load are rescanned
+                    self.rollup.refresh()
+                    transformed_data.update(self.rollup.aggregates())
+                else:
+                    if self.compact is not None:
+                        avg_age_stmt, percent_female_stmt, pop_change_stmt = self.compact.aggregate_statements()
+                    else:
+                        avg_age_stmt, percent_female_stmt, pop_change_stmt = self._statements()
+
+                    avg_age_results = self.connection.execute(avg_age_stmt).fetchall()
+                    percent_female_results = self.connection.execute(percent_female_stmt).fetchall()
+                    pop_change_results = self.connection.execute(pop_change_stmt).fetchall()
+
+                    transformed_data['avg_age'] = avg_age_results
+                    transformed_data['percent_female'] = percent_female_results
+                    transformed_data['pop_change'] = pop_change_results
+
+                if self.memory_budget is None:
+                    values_list = self._validate_frame(census_df)
+                else:
+                    values_list = self._validate_in_chunks(census_df)
 
+            if self.memory_budget is not None:
+                logger.info(f"Transform {describe_peak_memory(self.last_run_stats)}, "
+                            f"spilled {self.last_run_stats['spilled_chunks']} chunks")
             logger.info("Data transformation completed successfully")
             return transformed_data, values_list
 
         except Exception as e:
             logger.error(f"Transformation failed: {e}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,215 @@
+# src/vintages.py
+import re
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    MetaData, Table, Column, Index, Integer, String, UniqueConstraint,
+    inspect, select, insert, delete, func, literal
+)
+
+logger = logging.getLogger(__name__)
+
+LONG_CENSUS = 'census_long'
+WIDE_POP_COLUMN = re.compile(r'^pop(\d{4})$')
+GROWTH_METRICS = ('abs_change', 'pct_change', 'cagr')
+
+
+def wide_to_long(census_df):
+    """Unpivot ``pop<year>`` columns of a wide frame into (state, sex, age, year, pop) rows"""
+    pop_columns = {column: int(match.group(1)) for column in census_df.columns
+                   if (match := WIDE_POP_COLUMN.match(str(column)))}
+    if not pop_columns:
+        raise ValueError("No pop<year> columns found in census frame")
+    long_df = census_df.melt(id_vars=['state', 'sex', 'age'], value_vars=list(pop_columns),
+                             var_name='year', value_name='pop')
+    long_df['year'] = long_df['year'].map(pop_columns)
+    return long_df[['state', 'sex', 'age', 'year', 'pop']]
+
+
+class PopulationVintages:
+    """Long-format population store with one row per (state, sex, age, year).
+
+    Adding a new yearly estimate appends rows instead of widening the table,
+    and aggregates only read the years they ask for. Each (state, sex, age,
+    year) key is stored once.
+    """
+
+    def __init__(self, connection, engine, metadata=None):
+        self.connection = connection
+        self.engine = engine
+        self.metadata = metadata if metadata is not None else MetaData()
+        self.table = Table(LONG_CENSUS, self.metadata,
+                           Column('state', String(30), nullable=False),
+                           Column('sex', String(1), nullable=False),
+                           Column('age', Integer(), nullable=False),
+                           Column('year', Integer(), nullable=False),
+                           Column('pop', Integer()),
+                           UniqueConstraint('state', 'sex', 'age', 'year', name='uq_census_long_key'),
+                           Index('ix_census_long_year_state', 'year', 'state'),
+                           extend_existing=True)
+
+    def create(self):
+        """Create the long-format table if it does not exist.
+
+        Runs on ``self.connection`` so it shares any open transaction instead
+        of waiting on it from a second connection.
+        """
+        self.metadata.create_all(self.connection, tables=[self.table], checkfirst=True)
+
+    def exists(self):
+        """Return True if the database already has the long-format table"""
+        return inspect(self.connection).has_table(LONG_CENSUS)
+
+    def migrate_from_wide(self, census):
+        """Recompute the long rows of every pop<year> column of the wide census table.
+
+        The wide ``census`` table is the source of truth for the years it has
+        columns for: each of those years is deleted and rebuilt from it, so
+        re-running after later loads catches ``census_long`` up instead of
+        appending again. Repeated (state, sex, age) rows in the wide table are
+        summed into one row per key. Years that only exist in the long table
+        (loaded with ``load``) are left alone.
+        """
+        self.create()
+        migrated = 0
+        for column in census.columns:
+            match = WIDE_POP_COLUMN.match(column.name)
+            if not match:
+                continue
+            year = int(match.group(1))
+            self.connection.execute(delete(self.table).where(self.table.c.year == year))
+            stmt = insert(self.table).from_select(
+                ['state', 'sex', 'age', 'year', 'pop'],
+                select(census.c.state, census.c.sex, census.c.age, literal(year), func.sum(column))
+                .group_by(census.c.state, census.c.sex, census.c.age))
+            migrated += self.connection.execute(stmt).rowcount
+        logger.info(f"Migrated {migrated} rows into {LONG_CENSUS}")
+        return migrated
+
+    def load(self, long_df):
+        """Insert a (state, sex, age, year, pop) frame, e.g. a new yearly estimate.
+
+        Rows for a key that is already stored replace the old value, so
+        re-loading a revised vintage never duplicates it.
+        """
+        self.create()
+        records = long_df[['state', 'sex', 'age', 'year', 'pop']].to_dict('records')
+        if not records:
+            return 0
+        result = self.connection.execute(insert(self.table).prefix_with('OR REPLACE'), records)
+        logger.info(f"Loaded {result.rowcount} rows into {LONG_CENSUS}")
+        return result.rowcount
+
+    def years(self):
+        """Return the available vintages in ascending order"""
+        stmt = select(self.table.c.year).distinct().order_by(self.table.c.year)
+        return [row[0] for row in self.connection.execute(stmt).fetchall()]
+
+    def population_by_state(self, years=None, sex=None):
+        """Total population per state and year as a state x year frame, in one query"""
+        stmt = select(
+            self.table.c.state,
+            self.table.c.year,
+            func.sum(self.table.c.pop).label('pop')
+        ).group_by(self.table.c.state, self.table.c.year)
+        if years is not None:
+            stmt = stmt.where(self.table.c.year.in_(list(years)))
+        if sex is not None:
+            stmt = stmt.where(self.table.c.sex == sex)
+
+        rows = self.connection.execute(stmt).fetchall()
+        frame = pd.DataFrame(rows, columns=['state', 'year', 'pop'])
+        return frame.pivot(index='state', columns='year', values='pop').sort_index(axis=1)
+
+
+class GrowthEngine:
+    """Vectorized growth metrics over a state x year population frame"""
+
+    def __init__(self, population):
+        self.population = population
+        self.years = [int(year) for year in population.columns]
+        self.values = population.to_numpy(dtype=float)
+
+    @classmethod
+    def from_vintages(cls, vintages, years=None, sex=None):
+        return cls(vintages.population_by_state(years, sex))
+
+    def _metrics(self, start_values, end_values, spans):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            abs_change = end_values - start_values
+            pct_change = np.where(start_values != 0, abs_change / start_values * 100, np.nan)
+            cagr = np.where((start_values > 0) & (spans > 0),
+                            np.power(end_values / start_values, 1.0 / spans) - 1, np.nan) * 100
+        return abs_change, pct_change, cagr
+
+    def compare(self, start_year, end_year):
+        """Absolute change, percent change and CAGR (percent) between two vintages"""
+        start = self.values[:, self.years.index(start_year)]
+        end = self.values[:, self.years.index(end_year)]
+        abs_change, pct_change, cagr = self._metrics(start, end, np.float64(end_year - start_year))
+        return pd.DataFrame({
+            'start_pop': start,
+            'end_pop': end,
+            'abs_change': abs_change,
+            'pct_change': pct_change,
+            'cagr': cagr
+        }, index=self.population.index)
+
+    def compare_range(self, years=None):
+        """Metrics for every consecutive pair of ``years`` in one vectorized pass"""
+        years = sorted(years) if years is not None else self.years
+        if len(years) < 2:
+            raise ValueError("At least two vintages are needed to compute growth")
+        columns = [self.years.index(year) for year in years]
+        values = self.values[:, columns]
+        spans = np.diff(np.asarray(years, dtype=float))
+        abs_change, pct_change, cagr = self._metrics(values[:, :-1], values[:, 1:], spans)
+
+        states = np.repeat(self.population.index.to_numpy(), len(years) - 1)
+        return pd.DataFrame({
+            'state': states,
+            'start_year': np.tile(years[:-1], len(self.population)),
+            'end_year': np.tile(years[1:], len(self.population)),
+            'start_pop': values[:, :-1].ravel(),
+            'end_pop': values[:, 1:].ravel(),
+            'abs_change': abs_change.ravel(),
+            'pct_change': pct_change.ravel(),
+            'cagr': cagr.ravel()
+        })
+
+    def top_k(self, metric, start_year, end_year, k=10, ascending=False):
+        """Top ``k`` states by ``metric`` between two vintages"""
+        if metric not in GROWTH_METRICS:
+            raise ValueError(f"Unknown growth metric: {metric}")
+        metrics = self.compare(start_year, end_year)[metric].dropna()
+        values = metrics.to_numpy()
+        k = min(k, len(values))
+        if k == 0:
+            return metrics.iloc[:0]
+        order = values if ascending else -values
+        top = np.argpartition(order, k - 1)[:k]
+        top = top[np.argsort(order[top], kind='stable')]
+        return metrics.iloc[top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy the wide census table into the long-format vintage table")
+    parser.add_argument('db_path', help="Path to the census SQLite database")
+    args = parser.parse_args()
+
+    from src.database import DatabaseConnection
+    db_conn = DatabaseConnection(args.db_path)
+    try:
+        census, _ = db_conn.reflect_tables()
+        vintages = PopulationVintages(db_conn.connection, db_conn.engine, db_conn.metadata)
+        vintages.migrate_from_wide(census)
+        db_conn.connection.commit()
+    finally:
+        db_conn.close_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -1,4 +1,7 @@
 # src/visualization.py
+import os
+import json
+import hashlib
 import matplotlib.pyplot as plt
 import logging
 
@@ -8,20 +11,36 @@ class Visualizer:
     def __init__(self, results_dir):
         self.results_dir = results_dir
 
+    def _is_current(self, plot_path, fingerprint_path, fingerprint):
+        """True if the plot on disk was drawn from the same data"""
+        if not os.path.exists(plot_path) or not os.path.exists(fingerprint_path):
+            return False
+        with open(fingerprint_path) as f:
+            return f.read() == fingerprint
+
     def plot_population_change(self, pop_change_data):
         """Generate a plot of population changes by state"""
         try:
-            plt.figure(figsize=(10, 6))
             states = [row[0] for row in pop_change_data]
             changes = [row[1] for row in pop_change_data]
+            plot_path = f'{self.results_dir}/pop_change_plot.png'
+            fingerprint_path = f'{self.results_dir}/.pop_change_plot.sha256'
+            fingerprint = hashlib.sha256(json.dumps([states, changes], default=str).encode()).hexdigest()
+            if self._is_current(plot_path, fingerprint_path, fingerprint):
+                logger.info("Population change data unchanged; keeping existing plot")
+                return
+
+            plt.figure(figsize=(10, 6))
             plt.bar(states, changes)
             plt.xticks(rotation=45)
             plt.title('Top 10 States by Population Change')
             plt.xlabel('State')
             plt.ylabel('Population Change')
             plt.tight_layout()
-            plt.savefig(f'{self.results_dir}/pop_change_plot.png')
+            plt.savefig(plot_path)
             plt.close()
+            with open(fingerprint_path, 'w') as f:
+                f.write(fingerprint)
             logger.info("Population change plot saved successfully")
         except Exception as e:
             logger.error(f"Visualization failed: {e}")
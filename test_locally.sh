@@ -13,6 +13,7 @@ for port in 8000 8001 8002 8003; do
 done
 
 # Set environment variables
+export PYTHONPATH=.
 export DB_PATH=data/census.sqlite
 export CSV_PATH=data/census.csv
 export RESULTS_DIR=results
@@ -0,0 +1,19 @@
+import shutil
+import pytest
+from src.database import DatabaseConnection
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path to a scratch copy of data/census.sqlite that a test may modify"""
+    path = tmp_path / 'census.sqlite'
+    shutil.copy('data/census.sqlite', path)
+    return str(path)
+
+
+@pytest.fixture
+def db_conn(db_path):
+    """DatabaseConnection on the scratch copy, closed after the test"""
+    db_conn = DatabaseConnection(db_path)
+    yield db_conn
+    db_conn.close_connection()
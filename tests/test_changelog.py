@@ -0,0 +1,87 @@
+import shutil
+import pandas as pd
+import pytest
+from src.changelog import ChangeLog, StateRollup
+from src.database import DatabaseConnection
+from src.load import DataLoader
+from src.transform import DataTransformer
+
+EMPTY = pd.DataFrame(columns=['state', 'sex', 'age', 'pop2000', 'pop2008'])
+
+
+def _plain(aggregates):
+    return {key: [(row[0], pytest.approx(float(row[1]))) for row in rows] for key, rows in aggregates.items()}
+
+
+def test_rollup_refreshes_only_changed_states(db_conn, tmp_path):
+    census, state_fact = db_conn.reflect_tables()
+    changelog = ChangeLog(db_conn.connection, db_conn.engine, db_conn.metadata)
+    rollup = StateRollup(db_conn.connection, db_conn.engine, census, changelog)
+    scanning = DataTransformer(db_conn.connection, census, state_fact)
+    incremental = DataTransformer(db_conn.connection, census, state_fact, rollup=rollup)
+
+    assert rollup.refresh() is None
+    assert rollup.refresh() == set()
+    assert _plain(incremental.transform(EMPTY)[0]) == _plain(scanning.transform(EMPTY)[0])
+
+    loader = DataLoader(db_conn.connection, db_conn.engine, str(tmp_path), changelog=changelog)
+    batch = [{'state': 'Nevada', 'sex': 'F', 'age': 0, 'pop2000': 5000000, 'pop2008': 50000000},
+             {'state': 'Nevada', 'sex': 'F', 'age': 200, 'pop2000': 1, 'pop2008': 1}]
+    assert loader._insert_records(batch, census) == 2
+    generation = loader.last_run_stats['generation']
+
+    assert changelog.latest_generation() == generation
+    assert sorted(changelog.changes_since(generation - 1)) == [
+        ('Nevada', 'F', 0, 'update'), ('Nevada', 'F', 200, 'insert')]
+    assert changelog.affected_states(generation - 1) == {'Nevada'}
+
+    assert rollup.refresh() == {'Nevada'}
+    refreshed = incremental.transform(EMPTY)[0]
+    assert refreshed['pop_change'][0][0] == 'Nevada'
+    assert _plain(refreshed) == _plain(scanning.transform(EMPTY)[0])
+
+
+def test_rollup_rebuilds_after_untracked_writes(db_conn, tmp_path):
+    census, state_fact = db_conn.reflect_tables()
+    changelog = ChangeLog(db_conn.connection, db_conn.engine, db_conn.metadata)
+    rollup = StateRollup(db_conn.connection, db_conn.engine, census, changelog)
+    scanning = DataTransformer(db_conn.connection, census, state_fact)
+    incremental = DataTransformer(db_conn.connection, census, state_fact, rollup=rollup)
+    assert rollup.refresh() is None
+
+    # A loader without a change log, like the load service or a run without CHANGE_LOG
+    loader = DataLoader(db_conn.connection, db_conn.engine, str(tmp_path))
+    loader._insert_records([{'state': 'Nevada', 'sex': 'F', 'age': 0,
+                             'pop2000': 5000000, 'pop2008': 50000000}], census)
+
+    refreshed = incremental.transform(EMPTY)[0]
+    assert refreshed['pop_change'][0][0] == 'Nevada'
+    assert _plain(refreshed) == _plain(scanning.transform(EMPTY)[0])
+    assert rollup.refresh() == set()
+
+
+def test_change_log_survives_between_runs(tmp_path, monkeypatch, caplog):
+    import main_serial
+    (tmp_path / 'data').mkdir()
+    shutil.copy('data/census.sqlite', tmp_path / 'data' / 'census.sqlite')
+    with open('data/census.csv') as source, open(tmp_path / 'data' / 'census.csv', 'w') as target:
+        target.writelines(line for _, line in zip(range(200), source))
+    monkeypatch.setattr(main_serial, 'CHANGE_LOG', True)
+
+    with caplog.at_level('INFO', logger='src.changelog'):
+        main_serial.main(str(tmp_path))
+        main_serial.main(str(tmp_path))
+    messages = [record.getMessage() for record in caplog.records]
+    assert 'Started load generation 1' in messages
+    assert 'Started load generation 2' in messages
+    assert sum('(full rebuild)' in message for message in messages) == 1
+
+    db_conn = DatabaseConnection(str(tmp_path / 'data' / 'census.sqlite'))
+    census, _ = db_conn.reflect_tables()
+    changelog = ChangeLog(db_conn.connection, db_conn.engine, db_conn.metadata)
+    rollup = StateRollup(db_conn.connection, db_conn.engine, census, changelog)
+    assert changelog.latest_generation() == 2
+    assert changelog.rows_since(0) == 400
+    # The second run's inserts are not rolled up yet, so only their states are refreshed
+    assert rollup.refresh() == changelog.affected_states(1)
+    db_conn.close_connection()
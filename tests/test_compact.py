@@ -0,0 +1,113 @@
+import json
+import os
+import pandas as pd
+import pytest
+from sqlalchemy import inspect
+from src.database import DatabaseConnection
+from src.compact import CompactCensus
+from src.transform import DataTransformer
+
+
+def _aggregates(db_path):
+    db_conn = DatabaseConnection(db_path)
+    try:
+        census, state_fact = db_conn.reflect_tables()
+        compact = db_conn.reflect_compact_tables()
+        transformer = DataTransformer(db_conn.connection, census, state_fact, compact)
+        transformed_data, _ = transformer.transform(pd.DataFrame(
+            columns=['state', 'sex', 'age', 'pop2000', 'pop2008']))
+        return compact, transformed_data
+    finally:
+        db_conn.close_connection()
+
+
+def test_migration_preserves_aggregates(db_path):
+    compact, before = _aggregates(db_path)
+    assert compact is None
+
+    db_conn = DatabaseConnection(db_path)
+    CompactCensus(db_conn.engine).migrate()
+    assert 'census' in inspect(db_conn.engine).get_view_names()
+    db_conn.close_connection()
+
+    compact, after = _aggregates(db_path)
+    assert compact is not None
+    assert [tuple(row) for row in after['avg_age']] == [tuple(row) for row in before['avg_age']]
+    assert [tuple(row) for row in after['percent_female']] == \
+        pytest.approx([tuple(row) for row in before['percent_female']])
+    assert [tuple(row) for row in after['pop_change']] == [tuple(row) for row in before['pop_change']]
+
+
+def test_compatibility_view_accepts_inserts(db_path):
+    db_conn = DatabaseConnection(db_path)
+    CompactCensus(db_conn.engine).migrate()
+    census, _ = db_conn.reflect_tables()
+    db_conn.connection.execute(census.insert(), [
+        {'state': 'Atlantis', 'sex': 'F', 'age': 30, 'pop2000': 10, 'pop2008': 12}])
+    rows = db_conn.connection.execute(
+        census.select().where(census.c.state == 'Atlantis')).fetchall()
+    db_conn.close_connection()
+    assert [tuple(row) for row in rows] == [('Atlantis', 'F', 30, 10, 12)]
+
+
+def test_encode_registers_new_codes(db_path):
+    db_conn = DatabaseConnection(db_path)
+    compact = CompactCensus(db_conn.engine)
+    compact.migrate()
+    rows = compact.encode(db_conn.connection, [
+        {'state': 'Atlantis', 'sex': 'M', 'age': 1, 'pop2000': 2, 'pop2008': 3},
+        {'state': 'Illinois', 'sex': 'M', 'age': 1, 'pop2000': 2, 'pop2008': 3}])
+    db_conn.close_connection()
+    assert rows[0]['state_code'] != rows[1]['state_code']
+    assert rows[0]['sex_code'] == rows[1]['sex_code']
+
+
+def test_migration_shrinks_database_file(db_path):
+    size_before = os.path.getsize(db_path)
+    db_conn = DatabaseConnection(db_path)
+    CompactCensus(db_conn.engine).migrate()
+    db_conn.close_connection()
+    assert os.path.getsize(db_path) < size_before
+
+
+def test_migration_refuses_to_drop_rows(db_conn):
+    db_conn.connection.exec_driver_sql(
+        "INSERT INTO census (state, sex, age, pop2000, pop2008) VALUES ('Ohio', NULL, 1, 2, 3)")
+    db_conn.connection.commit()
+    with pytest.raises(ValueError, match='census rows'):
+        CompactCensus(db_conn.engine).migrate()
+    assert 'census' in inspect(db_conn.engine).get_table_names()
+
+
+def test_services_work_on_migrated_database(db_path, tmp_path, monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    import scripts.database as database_service
+    import scripts.load as load_service
+    import scripts.transform as transform_service
+
+    _, expected = _aggregates(db_path)
+    db_conn = DatabaseConnection(db_path)
+    CompactCensus(db_conn.engine).migrate()
+    db_conn.close_connection()
+
+    monkeypatch.setenv('DB_PATH', db_path)
+    monkeypatch.setenv('CSV_PATH', 'data/census.csv')
+    monkeypatch.setenv('TRANSFORMED_DATA_PATH', str(tmp_path / 'transformed_data.json'))
+    monkeypatch.setenv('RESULTS_DIR', str(tmp_path / 'results'))
+
+    with TestClient(database_service.app) as client:
+        assert client.get('/health').status_code == 200
+        assert client.get('/export', params={'dataset': 'state', 'format': 'ndjson'}).status_code == 200
+    for service in (transform_service, load_service):
+        assert TestClient(service.app).get('/health').status_code == 200
+
+    transform_service._transform_data()
+    with open(tmp_path / 'transformed_data.json') as f:
+        transformed_data = json.load(f)['transformed_data']
+    assert [tuple(row) for row in transformed_data['pop_change']] == \
+        [tuple(row) for row in expected['pop_change']]
+
+    assert load_service._load_data(include_report=False)['status'] == 'success'
+    with open(tmp_path / 'results' / 'census_report.json') as f:
+        assert len(json.load(f)['gender_ratio']) == len(transformed_data['percent_female'])
@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+from src.explorer import CensusExplorer
+
+
+@pytest.fixture
+def census_conn(db_conn):
+    census, _ = db_conn.reflect_tables()
+    return db_conn.connection, census
+
+
+def _top_growth(explorer):
+    return explorer.query().group_by('state').metric('pop_change', 'pct_change') \
+        .order_by('pop_change').limit(5)
+
+
+def test_sql_and_pandas_engines_agree(census_conn):
+    sql = CensusExplorer(*census_conn, engine='sql')
+    frame = CensusExplorer(*census_conn, engine='pandas')
+
+    for build in (
+        _top_growth,
+        lambda e: e.query().where(sex='F', age=(18, 64)).group_by('state').metric('avg_age', 'rows'),
+        lambda e: e.query().where(state=['Texas', 'Ohio']).group_by('state', 'sex').metric('pop2000'),
+        lambda e: e.query().metric('percent_female', 'avg_age'),
+    ):
+        expected, actual = build(sql).collect(), build(frame).collect()
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False)
+
+
+def test_results_are_memoized_per_shape(census_conn):
+    explorer = CensusExplorer(*census_conn)
+    first = _top_growth(explorer).collect()
+    second = _top_growth(explorer).collect()
+    assert explorer.scans == 1
+    pd.testing.assert_frame_equal(first, second)
+    assert list(first['state'][:1]) == ['Texas']
+
+    # Without a change log the cache is keyed on the row count, so new rows invalidate it
+    connection, census = census_conn
+    connection.execute(census.insert(), [
+        {'state': 'Nevada', 'sex': 'F', 'age': 30, 'pop2000': 0, 'pop2008': 50000000}])
+    refreshed = _top_growth(explorer).collect()
+    assert explorer.scans == 2
+    assert list(refreshed['state'][:1]) == ['Nevada']
+
+
+def test_collect_many_shares_one_scan(census_conn):
+    explorer = CensusExplorer(*census_conn)
+    by_state, by_age = explorer.collect_many(
+        explorer.query().where(state='Ohio').group_by('sex').metric('pop2008'),
+        explorer.query().where(state='Texas', age=(0, 4)).group_by('age').metric('pop_change'),
+    )
+    assert explorer.scans == 1
+    assert list(by_state['sex']) == ['F', 'M']
+    assert list(by_age['age']) == [0, 1, 2, 3, 4]
+
+    explorer.collect_many(explorer.query().where(state='Ohio').group_by('sex').metric('pop2008'))
+    assert explorer.scans == 1
+
+
+def test_rejects_unknown_metric(census_conn):
+    with pytest.raises(ValueError):
+        CensusExplorer(*census_conn).query().metric('median_income')
+
+
+@pytest.mark.parametrize('engine', ['sql', 'pandas'])
+def test_rejects_unknown_order_column(census_conn, engine):
+    query = CensusExplorer(*census_conn, engine=engine).query().group_by('state').metric('pop_change')
+    with pytest.raises(ValueError, match='Cannot order by'):
+        query.order_by('pop_chnage')
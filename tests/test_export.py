@@ -0,0 +1,90 @@
+import csv
+import io
+import itertools
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient
+import scripts.database as database_service
+
+
+@pytest.fixture
+def client(db_path, monkeypatch):
+    monkeypatch.setenv('DB_PATH', db_path)
+    with TestClient(database_service.app) as client:
+        yield client
+
+
+def _scalar(db_path, sql):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(sql).fetchone()[0]
+
+
+def test_export_rows_as_csv(client, db_path):
+    response = client.get('/export', params={'dataset': 'rows', 'format': 'csv'})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/csv')
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ['state', 'sex', 'age', 'pop2000', 'pop2008']
+    assert len(rows) - 1 == _scalar(db_path, 'SELECT count(*) FROM census')
+
+
+@pytest.mark.parametrize('dataset, key, groups_sql', [
+    ('age', 'age', 'SELECT count(*) FROM (SELECT DISTINCT age, sex FROM census)'),
+    ('state', 'state', 'SELECT count(*) FROM (SELECT DISTINCT state, sex FROM census)'),
+])
+def test_export_breakdowns_as_ndjson(client, db_path, dataset, key, groups_sql):
+    response = client.get('/export', params={'dataset': dataset, 'format': 'ndjson'})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == _scalar(db_path, groups_sql)
+    assert set(lines[0]) == {key, 'sex', 'pop2000', 'pop2008'}
+    assert sum(line['pop2000'] for line in lines) == _scalar(db_path, 'SELECT sum(pop2000) FROM census')
+
+
+@pytest.mark.parametrize('params', [
+    {'dataset': 'rows', 'format': 'xml'},
+    {'dataset': 'county', 'format': 'csv'},
+])
+def test_export_rejects_unknown_options(client, params):
+    assert client.get('/export', params=params).status_code == 400
+
+
+def test_export_is_split_across_partitions(client, db_path, monkeypatch):
+    total = _scalar(db_path, 'SELECT count(*) FROM census')
+    chunks = list(database_service.stream_export(db_path, 'rows', 'ndjson', batch_size=1000))
+    assert len(chunks) == -(-total // 1000)
+    assert sum(chunk.count('\n') for chunk in chunks) == total
+
+    streamed = []
+
+    def counting_export(*args):
+        for chunk in stream_export(*args):
+            streamed.append(chunk)
+            yield chunk
+
+    stream_export = database_service.stream_export
+    monkeypatch.setattr(database_service, 'stream_export', counting_export)
+    monkeypatch.setattr(database_service, 'EXPORT_BATCH_SIZE', 500)
+    response = client.get('/export', params={'dataset': 'rows', 'format': 'csv'})
+    assert len(response.text.splitlines()) == total + 1
+    assert len(streamed) == -(-total // 500)
+
+
+def test_export_can_be_advanced_from_different_threads(db_path):
+    # Starlette resumes a sync generator on whichever threadpool worker is free
+    total = _scalar(db_path, 'SELECT count(*) FROM census')
+    export = database_service.stream_export(db_path, 'rows', 'ndjson', batch_size=1000)
+    lines = 0
+    with ThreadPoolExecutor(max_workers=1) as first, ThreadPoolExecutor(max_workers=1) as second:
+        for index in itertools.count():
+            chunk = (first if index % 2 else second).submit(next, export, None).result()
+            if chunk is None:
+                break
+            lines += chunk.count('\n')
+    assert lines == total
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+from scripts.loadtest import ENDPOINTS, parse_mix, percentile, summarize
+
+
+def test_parse_mix():
+    assert parse_mix("load_health=8, transform=1,load") == {'load_health': 8.0, 'transform': 1.0, 'load': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("unknown=1")
+    with pytest.raises(ValueError):
+        parse_mix("load_health=0")
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_summarize_per_endpoint():
+    samples = [('load_health', 0.01, True), ('load_health', 0.03, True), ('load', 0.5, False),
+               ('database_health', 0.002, True)]
+    summary = summarize(samples, elapsed=2.0)
+    assert list(summary) == ['database GET /health', 'load GET /health', 'load POST /load']
+    assert summary['load GET /health']['requests'] == 2
+    assert summary['load GET /health']['throughput_rps'] == 1.0
+    assert summary['load GET /health']['latency_ms']['max'] == pytest.approx(30.0)
+    assert summary['load POST /load']['error_rate'] == 1.0
+
+
+def test_every_service_has_a_health_endpoint():
+    health = {service for service, method, path in ENDPOINTS.values() if path == '/health'}
+    assert health == {'database', 'transform', 'load', 'main'}
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+from src.profiling import DataProfiler, DataQualityError
+
+
+@pytest.fixture
+def profiler(db_conn):
+    _, state_fact = db_conn.reflect_tables()
+    return DataProfiler(db_conn.connection, state_fact, max_error_rate=0.25)
+
+
+def test_profile_counts_each_problem(profiler):
+    census_df = pd.DataFrame({
+        'state': ['Ohio', 'Ohio', 'Ohio', 'Atlantis', 'Ohio', 'Ohio', None, 'Ohio'],
+        'sex': ['F', 'F', 'X', 'M', 'M', 'M', 'F', 'F'],
+        'age': [1, 1, 2, 3, 120, 'abc', 5, 6],
+        'pop2000': [10, 10, 10, 10, 10, 10, 10, -1],
+        'pop2008': [11, 11, 11, 11, 11, 11, 11, 11],
+    })
+    report = profiler.profile(census_df)
+
+    assert report.rows == 8
+    assert report.duplicate_keys == 1
+    assert report.unknown_sex_codes == {'X': 1}
+    assert report.unknown_states == {'Atlantis': 1}
+    assert report.out_of_range_ages == 1
+    assert report.non_numeric == {'age': 1}
+    assert report.null_counts == {'state': 1}
+    assert report.negative_populations == 1
+    # The unknown state is reported but does not invalidate its row
+    assert report.invalid_rows == 6
+
+    with pytest.raises(DataQualityError) as excinfo:
+        profiler.enforce(report)
+    assert excinfo.value.report is report
+
+
+def test_clean_file_passes(profiler):
+    census_df = pd.read_csv('data/census.csv', header=None,
+                            names=['state', 'sex', 'age', 'pop2000', 'pop2008'])
+    report = profiler.enforce(profiler.profile(census_df))
+    assert report.invalid_rows == 0
+    assert report.unknown_states == {'District of Columbia': 172}
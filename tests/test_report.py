@@ -0,0 +1,59 @@
+import json
+import os
+import pandas as pd
+from src.load import DataLoader
+from src.transform import DataTransformer
+from src.report import CensusReport, ReportWriter
+
+
+AGGREGATES = {
+    'avg_age': [('F', 37.5), ('M', 35.25)],
+    'percent_female': [('Alabama', 51.2345), ('Alaska', 48.0)],
+    'pop_change': [('Texas', 3000000), ('Alaska', 25)],
+}
+
+
+def test_markdown_matches_legacy_layout(tmp_path):
+    content = ReportWriter(str(tmp_path)).write(CensusReport.from_aggregates(AGGREGATES))
+    assert content == (
+        "# Census Analysis Report\n\n"
+        "## Average Age by Gender\n- F: 37.50\n- M: 35.25\n"
+        "\n## Percentage Female by State\n- Alabama: 51.23%\n- Alaska: 48.00%\n"
+        "\n## Top 10 States by Population Change\n- Texas: 3,000,000\n- Alaska: 25\n"
+    )
+    with open(tmp_path / 'census_report.json') as f:
+        assert json.load(f)['pop_change'] == [['Texas', 3000000], ['Alaska', 25]]
+    assert '<h2>Average Age by Gender</h2>' in (tmp_path / 'census_report.html').read_text()
+
+
+def test_only_changed_sections_are_rerendered(tmp_path):
+    writer = ReportWriter(str(tmp_path))
+    writer.write(CensusReport.from_aggregates(AGGREGATES))
+    assert writer.changed_sections == ['avg_age', 'percent_female', 'pop_change']
+
+    mtime = os.stat(tmp_path / 'census_report.md').st_mtime_ns
+    writer.write(CensusReport.from_aggregates(AGGREGATES))
+    assert writer.changed_sections == []
+    assert os.stat(tmp_path / 'census_report.md').st_mtime_ns == mtime
+
+    updated = dict(AGGREGATES, pop_change=[('Texas', 3000001), ('Alaska', 25)])
+    content = writer.write(CensusReport.from_aggregates(updated))
+    assert writer.changed_sections == ['pop_change']
+    assert '- Texas: 3,000,001\n' in content
+    assert '- F: 37.50\n' in content
+
+
+def test_load_writes_report_from_sql_aggregates(db_conn, tmp_path):
+    census, state_fact = db_conn.reflect_tables()
+    transformed_data, _ = DataTransformer(db_conn.connection, census, state_fact).transform(
+        pd.DataFrame(columns=['state', 'sex', 'age', 'pop2000', 'pop2008']))
+
+    loader = DataLoader(db_conn.connection, db_conn.engine, str(tmp_path))
+    content = loader.load(transformed_data, [], census, state_fact)
+
+    with open(tmp_path / 'census_report.json') as f:
+        document = json.load(f)
+    assert [row[0] for row in document['avg_age']] == ['F', 'M']
+    assert all(isinstance(row[1], float) for row in document['avg_age'])
+    assert len(document['pop_change']) == 10
+    assert '## Average Age by Gender' in content
@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import pandas as pd
+import pytest
+from src.load import DataLoader
+from src.spill import SpilledRecords, estimate_records_bytes
+from src.transform import DataTransformer
+
+
+def _records(start, count):
+    return [{'state': 'Ohio', 'sex': 'F', 'age': i % 86, 'pop2000': i, 'pop2008': i + 1}
+            for i in range(start, start + count)]
+
+
+def test_spilled_records_preserve_order(tmp_path):
+    chunk_bytes = estimate_records_bytes(_records(0, 100))
+    spilled = SpilledRecords(memory_budget=chunk_bytes, spill_dir=tmp_path)
+    for start in range(0, 500, 100):
+        spilled.append(_records(start, 100))
+
+    assert len(spilled) == 500
+    assert spilled.spilled_chunks >= 3
+    assert [row['pop2000'] for chunk in spilled for row in chunk] == list(range(500))
+
+    spill_root = next(tmp_path.iterdir())
+    spilled.close()
+    assert not os.path.exists(spill_root)
+
+
+def test_budgeted_transform_and_load_match_unbudgeted(db_conn, tmp_path):
+    census_df = pd.read_csv('data/census.csv', header=None,
+                            names=['state', 'sex', 'age', 'pop2000', 'pop2008'])
+    census, state_fact = db_conn.reflect_tables()
+
+    _, expected = DataTransformer(db_conn.connection, census, state_fact).transform(census_df)
+    transformer = DataTransformer(db_conn.connection, census, state_fact,
+                                  memory_budget=256 * 1024, chunk_rows=1000, spill_dir=tmp_path)
+    _, spilled = transformer.transform(census_df)
+
+    assert isinstance(spilled, SpilledRecords)
+    assert [row for chunk in spilled for row in chunk] == expected
+    assert transformer.last_run_stats['spilled_chunks'] > 0
+    assert transformer.last_run_stats['peak_rss_bytes'] > 0
+
+    loader = DataLoader(db_conn.connection, db_conn.engine, str(tmp_path), memory_budget=256 * 1024)
+    assert loader._insert_records(spilled, census) == len(expected)
+    assert sum(len(batch) for batch in loader._iter_batches(expected)) == len(expected)
+    assert len(list(loader._iter_batches(expected))) > 1
+
+    spilled.close()
+
+
+def test_services_stream_records_under_budget(db_path, tmp_path, monkeypatch):
+    pytest.importorskip("fastapi")
+    import scripts.load as load_service
+    import scripts.transform as transform_service
+
+    shutil.copy('data/census.csv', tmp_path / 'census.csv')
+    monkeypatch.setenv('DB_PATH', db_path)
+    monkeypatch.setenv('CSV_PATH', str(tmp_path / 'census.csv'))
+    monkeypatch.setenv('TRANSFORMED_DATA_PATH', str(tmp_path / 'transformed_data.json'))
+    monkeypatch.setenv('RESULTS_DIR', str(tmp_path / 'results'))
+    monkeypatch.setattr(transform_service, 'MEMORY_BUDGET', 256 * 1024)
+    monkeypatch.setattr(load_service, 'MEMORY_BUDGET', 256 * 1024)
+
+    transform_service._transform_data()
+    with open(tmp_path / 'transformed_data.json') as f:
+        data = json.load(f)
+    assert 'values_list' not in data
+    with open(data['values_path']) as f:
+        rows = sum(1 for _ in f)
+
+    expected_batches = len(list(load_service.value_batches(data, 256 * 1024)))
+    assert expected_batches > 1
+
+    inserted = []
+    insert_batch = load_service.DataLoader._insert_batch
+    monkeypatch.setattr(load_service.DataLoader, '_insert_batch',
+                        lambda self, batch: inserted.append(len(batch)) or insert_batch(self, batch))
+    assert load_service._load_data(include_report=False)['status'] == 'success'
+    assert len(inserted) == expected_batches
+    assert sum(inserted) == rows
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select, func
+from src.load import DataLoader
+from src.transform import DataTransformer
+from src.vintages import GrowthEngine, PopulationVintages, wide_to_long
+
+
+def test_top_k_matches_wide_pop_change(db_conn):
+    census, state_fact = db_conn.reflect_tables()
+    vintages = PopulationVintages(db_conn.connection, db_conn.engine, db_conn.metadata)
+    vintages.migrate_from_wide(census)
+    assert vintages.years() == [2000, 2008]
+
+    transformed_data, _ = DataTransformer(db_conn.connection, census, state_fact).transform(
+        pd.DataFrame(columns=['state', 'sex', 'age', 'pop2000', 'pop2008']))
+    top = GrowthEngine.from_vintages(vintages).top_k('abs_change', 2000, 2008, k=10)
+    assert list(top.index) == [row[0] for row in transformed_data['pop_change']]
+    assert list(top.astype(int)) == [row[1] for row in transformed_data['pop_change']]
+
+
+def test_growth_metrics_over_range():
+    population = pd.DataFrame({2000: [100.0, 50.0], 2004: [121.0, 0.0], 2008: [121.0, 10.0]},
+                              index=['A', 'B'])
+    engine = GrowthEngine(population)
+
+    pair = engine.compare(2000, 2008)
+    assert pair.loc['A', 'abs_change'] == 21
+    assert pair.loc['A', 'pct_change'] == pytest.approx(21.0)
+    assert pair.loc['A', 'cagr'] == pytest.approx((1.21 ** (1 / 8) - 1) * 100)
+
+    ranged = engine.compare_range()
+    assert list(zip(ranged['state'], ranged['start_year'], ranged['end_year'])) == [
+        ('A', 2000, 2004), ('A', 2004, 2008), ('B', 2000, 2004), ('B', 2004, 2008)]
+    assert ranged['cagr'].iloc[1] == 0
+    assert np.isnan(ranged['pct_change'].iloc[3])
+
+    assert list(engine.top_k('pct_change', 2000, 2008, k=1, ascending=True).index) == ['B']
+
+
+def test_wide_to_long_and_load(db_conn):
+    wide = pd.DataFrame({'state': ['Ohio'], 'sex': ['F'], 'age': [1], 'pop2000': [5], 'pop2010': [7]})
+    long_df = wide_to_long(wide)
+    assert list(long_df['year']) == [2000, 2010]
+
+    vintages = PopulationVintages(db_conn.connection, db_conn.engine)
+    assert vintages.load(long_df) == 2
+    assert vintages.population_by_state(years=[2010]).loc['Ohio', 2010] == 7
+
+
+def test_migration_and_load_are_idempotent(db_conn, tmp_path):
+    census, _ = db_conn.reflect_tables()
+    vintages = PopulationVintages(db_conn.connection, db_conn.engine, db_conn.metadata)
+    assert vintages.migrate_from_wide(census) > 0
+    totals = vintages.population_by_state()
+    wide_texas = db_conn.connection.execute(
+        select(func.sum(census.c.pop2000)).where(census.c.state == 'Texas')).scalar()
+    assert totals.loc['Texas', 2000] == wide_texas
+
+    # Re-running on the same connection neither locks nor appends again
+    rows = vintages.migrate_from_wide(census)
+    assert vintages.population_by_state().loc['Texas', 2000] == wide_texas
+    new_year = pd.DataFrame({'state': ['Texas'], 'sex': ['F'], 'age': [0], 'year': [2010], 'pop': [10]})
+    vintages.load(new_year)
+    vintages.load(new_year.assign(pop=12))
+
+    # A later load into the wide table is picked up by the next migration
+    DataLoader(db_conn.connection, db_conn.engine, str(tmp_path))._insert_records(
+        [{'state': 'Texas', 'sex': 'M', 'age': 90, 'pop2000': 7, 'pop2008': 9}], census)
+    assert vintages.migrate_from_wide(census) == rows + 2
+    after = vintages.population_by_state()
+    assert after.loc['Texas', 2000] == wide_texas + 7
+    assert after.loc['Texas', 2010] == 12